@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from lazy_imports import lazy_module
+
+signal = lazy_module("scipy.signal")
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dsp_analisis")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+INDEX_NAME = "index.json"
+
+
+def content_hash(path, block_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _segment_chunks(n, nperseg, hop, segments_per_chunk):
+    """
+    Recorre los segmentos (nperseg muestras, salto hop) en tandas, devolviendo
+    (primer_segmento, número_de_segmentos, slice de muestras) por tanda.
+    """
+    total = (n - nperseg) // hop + 1 if n >= nperseg else 0
+    for first in range(0, total, segments_per_chunk):
+        count = min(segments_per_chunk, total - first)
+        start = first * hop
+        yield first, count, slice(start, start + (count - 1) * hop + nperseg)
+
+
+def welch_spectrum(audio, fs, chunk_segments=256):
+    """
+    Espectro de Welch (nperseg 4096) calculado por tandas: media de los
+    periodogramas de cada tanda ponderada por su número de segmentos, igual
+    que sobre el archivo entero pero sin que la memoria crezca con la duración.
+    """
+    n = len(audio)
+    nperseg = min(4096, max(n, 1))
+    if n <= nperseg:
+        return signal.welch(audio, fs, nperseg=nperseg)
+    hop = nperseg // 2
+    pxx_sum, total = 0.0, 0
+    for _, count, part in _segment_chunks(n, nperseg, hop, chunk_segments):
+        f, pxx = signal.welch(audio[part], fs, nperseg=nperseg)
+        pxx_sum = pxx_sum + pxx * count
+        total += count
+    return f, pxx_sum / total
+
+
+def compute_analysis(audio, fs, env_points=2000, spec_columns=512, chunk_segments=256):
+    """
+    Resúmenes que necesitan las vistas: pico, RMS, espectro de Welch,
+    envolvente min/max de la forma de onda y una miniatura del espectrograma.
+    Welch y el espectrograma se calculan por tandas de chunk_segments
+    segmentos, así la memoria no crece con la duración del archivo.
+    """
+    audio = np.asarray(audio)
+    n = len(audio)
+    analysis = {
+        "fs": np.array(fs),
+        "n_samples": np.array(n),
+        "peak": np.array(max(audio.max(), -audio.min()) if n else 0.0),
+        "rms": np.array(np.sqrt(np.dot(audio, audio) / n) if n else 0.0),
+    }
+
+    f, pxx = welch_spectrum(audio, fs, chunk_segments)
+    analysis["welch_freq"] = f.astype(np.float32)
+    analysis["welch_psd"] = pxx.astype(np.float32)
+
+    # Envolvente: mínimo y máximo por tramo. Sin copiar el audio: el tramo
+    # incompleto va aparte y los que quedan fuera del archivo repiten la
+    # última muestra
+    points = max(min(env_points, n), 1)
+    step = -(-n // points) if n else 1
+    full = n // step
+    env_min = np.zeros(points, dtype=np.float32)
+    env_max = np.zeros(points, dtype=np.float32)
+    if full:
+        frames = audio[:full * step].reshape(full, step)
+        env_min[:full] = frames.min(axis=1)
+        env_max[:full] = frames.max(axis=1)
+    if full < points and n:
+        env_min[full:] = env_max[full:] = audio[-1]
+        if full * step < n:
+            env_min[full] = audio[full * step:].min()
+            env_max[full] = audio[full * step:].max()
+    analysis["env_min"] = env_min
+    analysis["env_max"] = env_max
+    analysis["env_time"] = (np.arange(points) * step / fs).astype(np.float32)
+
+    # Miniatura del espectrograma: cada columna promedia `group` segmentos;
+    # las tandas son múltiplos de group para promediar sobre la marcha
+    nfft = 1024
+    hop = nfft // 2
+    if n >= nfft:
+        cols = (n - nfft) // hop + 1
+        group = -(-cols // spec_columns)
+        usable = cols // group * group or cols
+        group = min(group, usable)
+        per_chunk = group * max(1, chunk_segments // group)
+        columns = []
+        for _, count, part in _segment_chunks(usable * hop + nfft - hop, nfft, hop, per_chunk):
+            spec_f, _, sxx = signal.spectrogram(audio[part], fs, nperseg=nfft, noverlap=nfft - hop)
+            columns.append(sxx.reshape(sxx.shape[0], -1, group).mean(axis=2))
+        sxx = np.concatenate(columns, axis=1)
+        centers = (np.arange(usable) * hop + nfft / 2) / fs
+        analysis["spec_freq"] = spec_f.astype(np.float32)
+        analysis["spec_time"] = centers.reshape(-1, group).mean(axis=1).astype(np.float32)
+        analysis["spec_db"] = (10 * np.log10(sxx + 1e-12)).astype(np.float32)
+
+    return analysis
+
+
+class AnalysisCache:
+    """
+    Caché en disco de análisis por archivo. La clave combina ruta, tamaño,
+    mtime y hash del contenido; index.json guarda las entradas y se descartan
+    las menos usadas cuando el directorio supera max_bytes. Si el disco no
+    deja leer o escribir, se calcula el análisis sin caché.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(cache_dir, INDEX_NAME)
+        self.enabled = True
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Caché de análisis desactivada ({e})")
+            self.enabled = False
+        self._index = self._read_index() if self.enabled else {"files": {}, "entries": {}}
+
+    def _read_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"files": {}, "entries": {}}
+
+    def _write_index(self):
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self._index_path)
+
+    def _key(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        known = self._index["files"].get(path)
+        # Si ruta, tamaño y mtime coinciden reutilizamos el hash ya calculado
+        if known and known["size"] == st.st_size and known["mtime"] == st.st_mtime_ns:
+            return known["hash"]
+        digest = content_hash(path)
+        self._index["files"][path] = {"size": st.st_size, "mtime": st.st_mtime_ns, "hash": digest}
+        return digest
+
+    def get(self, path):
+        key = self._key(path)
+        entry = self._index["entries"].get(key)
+        if entry is None:
+            return None
+        try:
+            with np.load(os.path.join(self.cache_dir, entry["file"])) as data:
+                analysis = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            del self._index["entries"][key]
+            self._write_index()
+            return None
+        entry["last_used"] = time.time()
+        self._write_index()
+        return analysis
+
+    def put(self, path, analysis):
+        key = self._key(path)
+        file_name = key + ".npz"
+        full_path = os.path.join(self.cache_dir, file_name)
+        np.savez_compressed(full_path, **analysis)
+        self._index["entries"][key] = {
+            "file": file_name,
+            "bytes": os.path.getsize(full_path),
+            "last_used": time.time(),
+        }
+        self._evict()
+        self._write_index()
+
+    def load_or_compute(self, path, audio, fs):
+        if not self.enabled:
+            return compute_analysis(audio, fs)
+        try:
+            analysis = self.get(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No se pudo leer la caché de análisis: {e}")
+            analysis = None
+        if analysis is None or int(analysis["n_samples"]) != len(audio):
+            analysis = compute_analysis(audio, fs)
+            try:
+                self.put(path, analysis)
+            except (OSError, ValueError) as e:
+                # Disco lleno o de solo lectura: el análisis sigue siendo válido
+                print(f"No se pudo guardar en la caché de análisis: {e}")
+        return analysis
+
+    def _evict(self):
+        entries = self._index["entries"]
+        total = sum(e["bytes"] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries[key]["bytes"]
+            try:
+                os.remove(os.path.join(self.cache_dir, entries[key]["file"]))
+            except OSError:
+                pass
+            del entries[key]
+        live = set(entries)
+        self._index["files"] = {p: v for p, v in self._index["files"].items() if v["hash"] in live}
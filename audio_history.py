@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import numpy as np
+
+
+DEFAULT_RAM_BUDGET = 512 * 1024 * 1024
+
+
+class ProcessingHistory:
+    """
+    Historial versionado de resultados de procesado. Cada versión apunta a un
+    buffer float32 de solo lectura; versiones con el mismo contenido comparten
+    buffer y una operación ya aplicada sobre la misma versión no se recalcula.
+    Cuando los buffers en RAM superan ram_budget_bytes, los menos usados se
+    vuelcan a archivos temporales y se siguen leyendo con np.memmap. Los
+    buffers fijados (pin=True, como el original) cuentan para el presupuesto
+    pero nunca se vuelcan.
+    """
+
+    def __init__(self, ram_budget_bytes=DEFAULT_RAM_BUDGET, spill_dir=None):
+        self.ram_budget_bytes = ram_budget_bytes
+        self._spill_dir = tempfile.mkdtemp(prefix="dsp_historial_", dir=spill_dir)
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+        self._lock = threading.RLock()
+        self._tick = 0
+        self.generation = -1
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for buf in getattr(self, "_buffers", {}).values():
+                self._drop_file(buf)
+            self._buffers = {}
+            self._versions = []
+            self._memo = {}
+            self.current = None
+            # Cambia en cada reset para reconocer resultados de un historial anterior
+            self.generation += 1
+
+    def close(self):
+        self.reset()
+        self._finalizer()
+
+    def _touch(self, buf):
+        self._tick += 1
+        buf["last_used"] = self._tick
+
+    @staticmethod
+    def _drop_file(buf):
+        if buf["path"] is not None:
+            buf["array"] = None
+            try:
+                os.remove(buf["path"])
+            except OSError:
+                pass
+
+    def add(self, audio, label, params=None, parent=None, make_current=True, pin=False, copy=True):
+        """
+        Guarda un resultado como nueva versión y (por defecto) la hace actual.
+        Con copy=False el historial se queda con el array float32 recibido en
+        lugar de copiarlo; quien llama no debe modificarlo después.
+        """
+        data = np.ascontiguousarray(audio, dtype=np.float32)
+        digest = hashlib.blake2b(data.view(np.uint8), digest_size=16).hexdigest()
+        with self._lock:
+            buf = self._buffers.get(digest)
+            if buf is None:
+                # Copia propia si no hubo conversión, para que nadie la modifique por fuera
+                if copy and (data is audio or np.shares_memory(data, audio)):
+                    data = data.copy()
+                data.setflags(write=False)
+                buf = {"array": data, "path": None, "nbytes": data.nbytes, "last_used": 0, "pinned": False}
+                self._buffers[digest] = buf
+            buf["pinned"] = buf["pinned"] or pin
+            self._touch(buf)
+            version = len(self._versions)
+            self._versions.append({
+                "id": version,
+                "label": label,
+                "params": params or {},
+                "parent": parent,
+                "digest": digest,
+            })
+            if make_current:
+                self.current = version
+            self._enforce_budget(keep=digest)
+            return version
+
+    def apply(self, func, label, params=None, parent=None, make_current=True):
+        """
+        Aplica func(audio) sobre la versión parent (por defecto la actual) y
+        guarda el resultado. Si esa operación con esos parámetros ya se aplicó
+        a la misma versión, devuelve la existente sin recalcular. Si el
+        historial se reinicia mientras func calcula, el resultado se descarta
+        y devuelve None.
+        """
+        with self._lock:
+            if parent is None:
+                parent = self.current
+            key = (parent, label, json.dumps(params or {}, sort_keys=True, default=str))
+            if key in self._memo:
+                if make_current:
+                    self.current = self._memo[key]
+                return self._memo[key]
+            source = self.get(parent) if parent is not None else None
+            generation = self.generation
+        result = func(source)
+        with self._lock:
+            if self.generation != generation:
+                return None
+            version = self.add(result, label, params, parent, make_current)
+            self._memo[key] = version
+            return version
+
+    def get(self, version=None):
+        with self._lock:
+            if version is None:
+                version = self.current
+            if version is None:
+                return None
+            buf = self._buffers[self._versions[version]["digest"]]
+            self._touch(buf)
+            return buf["array"]
+
+    def checkout(self, version):
+        with self._lock:
+            if not 0 <= version < len(self._versions):
+                raise IndexError(f"No existe la versión {version}")
+            self.current = version
+            return self.get(version)
+
+    def undo(self):
+        """Vuelve a la versión de la que salió la actual."""
+        with self._lock:
+            if self.current is None:
+                return None
+            parent = self._versions[self.current]["parent"]
+            if parent is None:
+                return self.get(self.current)
+            return self.checkout(parent)
+
+    def versions(self):
+        with self._lock:
+            return [dict(v, spilled=self._buffers[v["digest"]]["path"] is not None) for v in self._versions]
+
+    def memory_usage(self):
+        with self._lock:
+            ram = sum(b["nbytes"] for b in self._buffers.values() if b["path"] is None)
+            spilled = sum(b["nbytes"] for b in self._buffers.values() if b["path"] is not None)
+            return {"ram_bytes": ram, "spilled_bytes": spilled, "buffers": len(self._buffers)}
+
+    def _enforce_budget(self, keep=None):
+        in_ram = [(d, b) for d, b in self._buffers.items() if b["path"] is None]
+        ram = sum(b["nbytes"] for _, b in in_ram)
+        for digest, buf in sorted(in_ram, key=lambda item: item[1]["last_used"]):
+            if ram <= self.ram_budget_bytes:
+                break
+            if digest == keep or buf["pinned"]:
+                continue
+            self._spill(digest, buf)
+            ram -= buf["nbytes"]
+
+    def _spill(self, digest, buf):
+        path = os.path.join(self._spill_dir, digest + ".f32")
+        array = buf["array"]
+        if array.size:
+            mm = np.memmap(path, dtype=np.float32, mode="w+", shape=array.shape)
+            mm[:] = array
+            mm.flush()
+            del mm
+            buf["array"] = np.memmap(path, dtype=np.float32, mode="r", shape=array.shape)
+        else:
+            open(path, "wb").close()
+        buf["path"] = path
@@ -1,10 +1,17 @@
+import os
 import numpy as np
-from scipy import signal
-from scipy.fft import fft
-import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from audio_profiling import profiled, stage
+from lazy_imports import lazy_module
 
+signal = lazy_module("scipy.signal")
+sp_fft = lazy_module("scipy.fft")
+sf = lazy_module("soundfile")
 
 
+
+@profiled("design_bandpass_filter")
 def design_bandpass_filter(fs, lowcut=300, highcut=3400, order=101):
     nyq = 0.5 * fs
     low = lowcut / nyq
@@ -12,28 +19,122 @@ def design_bandpass_filter(fs, lowcut=300, highcut=3400, order=101):
     b = signal.firwin(order, [low, high], pass_zero=False, window='hamming')
     return b
 
-def apply_filter(audio, b):
-    filtered = signal.lfilter(b, 1, audio)
-    max_amp = np.max(np.abs(filtered))
-    if max_amp > 0:
-        filtered = filtered / max_amp * 0.9
-    sf.write('audio_filtrado.wav', filtered, 44100)
+def _filter_chunk(x, y, b, start, stop):
+    # Arrancamos (taps-1) muestras antes para que el estado del FIR sea
+    # idéntico al de una pasada completa y descartamos ese calentamiento
+    lo = max(start - (len(b) - 1), 0)
+    y[start:stop] = signal.lfilter(b, 1, x[lo:stop])[start - lo:]
+
+
+def _filter_chunk_shm(in_name, out_name, n, in_dtype, out_dtype, b, start, stop):
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    try:
+        x = np.ndarray((n,), dtype=in_dtype, buffer=shm_in.buf)
+        y = np.ndarray((n,), dtype=out_dtype, buffer=shm_out.buf)
+        _filter_chunk(x, y, b, start, stop)
+        del x, y
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+
+def lfilter_parallel(b, audio, workers=None, chunk_size=None, use_processes=True):
+    """
+    FIR por bloques repartido entre varios núcleos. Cada bloque se filtra con
+    (taps-1) muestras de solapamiento, así que el resultado es bit a bit igual
+    a signal.lfilter(b, 1, audio). Con procesos, la entrada y la salida viven
+    en memoria compartida y no se serializan.
+    """
+    b = np.asarray(b)
+    audio = np.ascontiguousarray(audio)
+    n = len(audio)
+    workers = workers or os.cpu_count() or 1
+    out_dtype = np.result_type(b.dtype, audio.dtype, np.float64)
+
+    if chunk_size is None:
+        chunk_size = -(-n // workers)
+    # Bloques más largos que el filtro: si el tramo a filtrar no supera a b,
+    # lfilter cambia el orden de las sumas y se pierde la exactitud
+    chunk_size = max(int(chunk_size), len(b) + 1)
+    bounds = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    if len(bounds) > 1 and bounds[-1][1] - bounds[-1][0] <= len(b):
+        bounds[-2:] = [(bounds[-2][0], n)]
+
+    if workers == 1 or len(bounds) <= 1:
+        return signal.lfilter(b, 1, audio)
+
+    if not use_processes:
+        filtered = np.empty(n, dtype=out_dtype)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_filter_chunk, audio, filtered, b, start, stop)
+                       for start, stop in bounds]
+            for future in futures:
+                future.result()
+        return filtered
+
+    shm_in = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+    shm_out = shared_memory.SharedMemory(create=True, size=max(n * out_dtype.itemsize, 1))
+    try:
+        x = np.ndarray((n,), dtype=audio.dtype, buffer=shm_in.buf)
+        x[:] = audio
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_filter_chunk_shm, shm_in.name, shm_out.name, n,
+                                   audio.dtype, out_dtype, b, start, stop)
+                       for start, stop in bounds]
+            for future in futures:
+                future.result()
+        filtered = np.ndarray((n,), dtype=out_dtype, buffer=shm_out.buf).copy()
+        del x
+    finally:
+        shm_in.close()
+        shm_in.unlink()
+        shm_out.close()
+        shm_out.unlink()
+    return filtered
+
+
+@profiled("apply_filter")
+def apply_filter(audio, b, workers=1, use_processes=True, save_path='audio_filtrado.wav'):
+    with stage("lfilter", len(audio)):
+        if workers == 1:
+            filtered = signal.lfilter(b, 1, audio)
+        else:
+            filtered = lfilter_parallel(b, audio, workers=workers, use_processes=use_processes)
+    with stage("normalize", len(filtered)):
+        max_amp = np.max(np.abs(filtered))
+        if max_amp > 0:
+            filtered = filtered / max_amp * 0.9
+    if save_path:
+        with stage("sf.write", len(filtered)):
+            sf.write(save_path, filtered, 44100)
     return filtered
 
-def apply_noise_reduction(audio, fs, noise_level=0.5):
-    noise_sample_size = int(0.1 * fs)
-    noise_sample = audio[:noise_sample_size]
-    noise_fft = fft(noise_sample)
-    noise_power = np.abs(noise_fft) ** 2
-    signal_fft = fft(audio)
-    signal_power = np.abs(signal_fft) ** 2
-    reduction = np.maximum(1 - noise_level * noise_power.mean() / (signal_power + 1e-10), 0)
-    filtered_fft = signal_fft * reduction
-    filtered = np.real(np.fft.ifft(filtered_fft))
-    max_amp = np.max(np.abs(filtered))
-    if max_amp > 0:
-        filtered = filtered / max_amp * 0.9
-    sf.write('audio_sin_ruido.wav', filtered, fs)
+@profiled("apply_noise_reduction")
+def apply_noise_reduction(audio, fs, noise_level=0.5, save_path='audio_sin_ruido.wav', noise_sample=None,
+                          normalize=True):
+    # Por defecto el perfil de ruido son los primeros 100 ms del propio audio
+    if noise_sample is None:
+        noise_sample_size = int(0.1 * fs)
+        noise_sample = audio[:noise_sample_size]
+    with stage("fft", len(audio)):
+        noise_fft = sp_fft.fft(noise_sample)
+        noise_power = np.abs(noise_fft) ** 2
+        signal_fft = sp_fft.fft(audio)
+        signal_power = np.abs(signal_fft) ** 2
+    with stage("spectral_gain", len(audio)):
+        reduction = np.maximum(1 - noise_level * noise_power.mean() / (signal_power + 1e-10), 0)
+        filtered_fft = signal_fft * reduction
+    with stage("ifft", len(audio)):
+        filtered = np.real(np.fft.ifft(filtered_fft))
+    if normalize:
+        with stage("normalize", len(filtered)):
+            max_amp = np.max(np.abs(filtered))
+            if max_amp > 0:
+                filtered = filtered / max_amp * 0.9
+    if save_path:
+        with stage("sf.write", len(filtered)):
+            sf.write(save_path, filtered, fs)
     return filtered
 
 
@@ -62,7 +163,8 @@ def design_peaking_iir(fs, f0, gain_db, Q=1):
     return b, a
 
 
-def apply_equalizer(audio, fs, eq_settings):
+@profiled("apply_equalizer")
+def apply_equalizer(audio, fs, eq_settings, normalize=True):
     """
     Aplica 5 filtros en secuencia: 2 FIR (LPF, HPF) y 3 IIR peaking.
     eq_settings = {
@@ -78,22 +180,79 @@ def apply_equalizer(audio, fs, eq_settings):
         return None
 
     # LPF
-    lpf = design_lpf_fir(fs, cutoff=eq_settings["lpf_cutoff"])
-    filtered = signal.lfilter(lpf, 1, audio)
+    with stage("design", 0):
+        lpf = design_lpf_fir(fs, cutoff=eq_settings["lpf_cutoff"])
+    with stage("lfilter", len(audio)):
+        filtered = signal.lfilter(lpf, 1, audio)
 
     # HPF
-    hpf = design_hpf_fir(fs, cutoff=eq_settings["hpf_cutoff"])
-    filtered = signal.lfilter(hpf, 1, filtered)
+    with stage("design", 0):
+        hpf = design_hpf_fir(fs, cutoff=eq_settings["hpf_cutoff"])
+    with stage("lfilter", len(audio)):
+        filtered = signal.lfilter(hpf, 1, filtered)
 
     # 3 peaking filters
     for band in eq_settings["bands"]:
-        b, a = design_peaking_iir(fs, band["f0"], band["gain"], band["Q"])
-        filtered = signal.lfilter(b, a, filtered)
+        with stage("design", 0):
+            b, a = design_peaking_iir(fs, band["f0"], band["gain"], band["Q"])
+        with stage("lfilter", len(audio)):
+            filtered = signal.lfilter(b, a, filtered)
 
     # Normalizamos
-    max_amp = np.max(np.abs(filtered))
-    if max_amp > 0:
-        filtered = filtered / max_amp * 0.9
+    if normalize:
+        with stage("normalize", len(filtered)):
+            max_amp = np.max(np.abs(filtered))
+            if max_amp > 0:
+                filtered = filtered / max_amp * 0.9
 
     return filtered
 
+
+def _one_pole_coeff(fs, time_ms):
+    if time_ms <= 0:
+        return 0.0
+    return float(np.exp(-1.0 / (fs * time_ms / 1000.0)))
+
+
+def apply_compressor(audio, fs, comp_settings, zi=None):
+    """
+    Compresor/limitador por bloques, pensado para el callback en tiempo real.
+    comp_settings = {
+        "threshold": ...,   # dB
+        "ratio": ...,       # np.inf -> limitador
+        "attack": ...,      # ms
+        "release": ...,     # ms
+        "makeup": ...,      # dB (opcional)
+        "ceiling": ...,     # amplitud máxima de salida (opcional)
+    }
+    El seguidor de envolvente son dos filtros de un polo (ataque y
+    liberación) evaluados con lfilter; zi/zf guarda su estado entre bloques
+    igual que en signal.lfilter. Devuelve (audio_comprimido, zf).
+    """
+    if audio is None:
+        return None, zi
+
+    a_att = _one_pole_coeff(fs, comp_settings.get("attack", 5))
+    a_rel = _one_pole_coeff(fs, comp_settings.get("release", 100))
+    if zi is None:
+        zi = np.zeros(2)
+
+    rectified = np.abs(audio)
+    env_att, zf_att = signal.lfilter([1 - a_att], [1, -a_att], rectified, zi=zi[:1])
+    env_rel, zf_rel = signal.lfilter([1 - a_rel], [1, -a_rel], rectified, zi=zi[1:])
+    # Ataque rápido y caída lenta: la envolvente sigue al más alto de los dos
+    envelope = np.maximum(env_att, env_rel)
+
+    ratio = comp_settings.get("ratio", 4)
+    slope = 1.0 if np.isinf(ratio) else 1.0 - 1.0 / ratio
+    level_db = 20 * np.log10(envelope + 1e-10)
+    over_db = np.maximum(level_db - comp_settings["threshold"], 0)
+    gain = 10 ** ((comp_settings.get("makeup", 0) - slope * over_db) / 20)
+
+    compressed = audio * gain
+    ceiling = comp_settings.get("ceiling")
+    if ceiling is not None:
+        np.clip(compressed, -ceiling, ceiling, out=compressed)
+
+    return compressed, np.concatenate([zf_att, zf_rel])
+
@@ -1,42 +1,127 @@
 import numpy as np
-import sounddevice as sd
-import soundfile as sf
 import threading
 from audio_operations import apply_noise_reduction, apply_equalizer
+from audio_realtime import RealtimeChain, BlockRecorder
+from audio_profiling import profiled, stage
+from audio_history import ProcessingHistory, DEFAULT_RAM_BUDGET
+from lazy_imports import lazy_module
+
+sd = lazy_module("sounddevice")
+sf = lazy_module("soundfile")
+
+# Muestras previas que se procesan y descartan para que los filtros lleguen
+# asentados al inicio de la región de previsualización
+PREVIEW_WARMUP_S = 0.5
+
+MONITOR_BLOCKSIZE = 4096
+SETTINGS_POLL_S = 0.05
 
 
 class AudioProcessor:
-    def __init__(self, fs=44100, duration=5):
+    def __init__(self, fs=44100, duration=5, analysis_cache=None, history_budget_bytes=DEFAULT_RAM_BUDGET):
         self.fs = fs
         self.duration = duration
         self.audio_data = None
         self.filtered_audio = None
+        self.preview_audio = None
+        self.analysis = None
+        self.analysis_cache = analysis_cache
+        self.history = ProcessingHistory(ram_budget_bytes=history_budget_bytes)
+        self._original_version = None
         self._stream = None
         self._stream_thread = None
+        self._worker_threads = []
+        self._recorder = None
         self._recorded = []
         self._stop_monitor = threading.Event()
+        self.render_error = None
+        self.render_discarded = False
+        self._render_token = 0
+        self._render_threads = []
+        self._input_peak = None
+        self._analysis_thread = None
+        # Protege el cambio de audio/historial frente a un render que termina
+        self._state_lock = threading.Lock()
 
+    @profiled("record_audio")
     def record_audio(self):
         print(f"Grabando audio por {self.duration} segundos...")
-        self.audio_data = sd.rec(int(self.duration * self.fs), samplerate=self.fs, channels=1)
-        sd.wait()
+        n_samples = int(self.duration * self.fs)
+        with stage("sd.rec", n_samples):
+            self.audio_data = sd.rec(n_samples, samplerate=self.fs, channels=1)
+            sd.wait()
         self.audio_data = self.audio_data.flatten()
-        sf.write('audio_original.wav', self.audio_data, self.fs)
+        self.analysis = None
+        self._reset_history()
+        with stage("sf.write", n_samples):
+            sf.write('audio_original.wav', self.audio_data, self.fs)
         print("Grabación completada y guardada como 'audio_original.wav'")
         return self.audio_data
 
+    @profiled("load_audio")
     def load_audio(self, file_path):
         try:
-            self.audio_data, new_fs = sf.read(file_path, always_2d=False)
+            with stage("sf.read") as st:
+                # float32 directamente: es lo que guarda el historial
+                self.audio_data, new_fs = sf.read(file_path, dtype="float32", always_2d=False)
+                st.add_samples(len(self.audio_data))
             self.fs = new_fs
             if len(self.audio_data.shape) > 1:
-                self.audio_data = np.mean(self.audio_data, axis=1)
+                with stage("downmix", len(self.audio_data)):
+                    self.audio_data = np.mean(self.audio_data, axis=1)
+            self.analysis = None
+            self._reset_history()
+            if self.analysis_cache is not None:
+                self._analyze_in_background(file_path, self.audio_data, self.fs)
             print(f"Audio cargado desde {file_path}")
             return self.audio_data
         except Exception as e:
             print(f"Error al cargar el archivo: {e}")
             return None
 
+    def _analyze_in_background(self, file_path, audio, fs):
+        # Hash y análisis fuera del hilo que carga (el de Tk en la GUI); hasta
+        # que acaben, las vistas dibujan directamente desde audio_data
+        def run():
+            try:
+                with stage("analysis", len(audio)):
+                    analysis = self.analysis_cache.load_or_compute(file_path, audio, fs)
+            except Exception as e:
+                print(f"No se pudo analizar el archivo: {e}")
+                return
+            with self._state_lock:
+                if self.audio_data is audio:
+                    self.analysis = analysis
+
+        self._analysis_thread = threading.Thread(target=run, daemon=True)
+        self._analysis_thread.start()
+        return self._analysis_thread
+
+    def _reset_history(self):
+        with self._state_lock:
+            self.history.reset()
+            self.filtered_audio = None
+            self._input_peak = None
+            # El original vive solo en el historial (float32, fijado en RAM y
+            # contado en su presupuesto); audio_data apunta a ese mismo buffer
+            self._original_version = self.history.add(self.audio_data, "original", pin=True, copy=False)
+            self.audio_data = self.history.get(self._original_version)
+
+    def _apply_to_original(self, label, params, func):
+        # Cada operación parte del original; si ya se hizo con esos parámetros
+        # el historial devuelve el resultado guardado sin recalcular
+        version = self.history.apply(func, label, params, parent=self._original_version)
+        self.filtered_audio = self.history.get(version)
+        return self.filtered_audio
+
+    def undo(self):
+        self.filtered_audio = self.history.undo()
+        return self.filtered_audio
+
+    def checkout(self, version):
+        self.filtered_audio = self.history.checkout(version)
+        return self.filtered_audio
+
     def play_audio(self, audio=None):
         if audio is None:
             audio = self.audio_data
@@ -48,42 +133,160 @@ class AudioProcessor:
 
     def reduce_noise(self, level=0.5):
         if self.audio_data is not None:
-            self.filtered_audio = apply_noise_reduction(self.audio_data, self.fs, level)
-            return self.filtered_audio
+            return self._apply_to_original(
+                "noise_reduction", {"level": level},
+                lambda audio: apply_noise_reduction(audio, self.fs, level))
         else:
             print("No hay audio cargado para reducir ruido.")
             return None
 
-    def monitor_audio(self, eq_settings_getter, record=True):
-        self._recorded.clear()
-        self._stop_monitor.clear()
+    def _preview(self, process, start_s, duration_s, play):
+        if self.audio_data is None:
+            print("No hay audio cargado para previsualizar.")
+            return None
+        n = len(self.audio_data)
+        start = min(max(int(start_s * self.fs), 0), n)
+        stop = min(start + int(duration_s * self.fs), n)
+        lo = max(start - int(PREVIEW_WARMUP_S * self.fs), 0)
+        region = process(self.audio_data[lo:stop])[start - lo:]
+        # Misma ganancia que tendrá el render completo (0.9 / pico del
+        # resultado): estimamos ese pico con el del original, o con el de la
+        # región si ya lo supera, para que una zona tranquila no suene más fuerte
+        if self._input_peak is None:
+            self._input_peak = float(np.max(np.abs(self.audio_data))) if len(self.audio_data) else 0.0
+        max_amp = max(self._input_peak, float(np.max(np.abs(region))) if len(region) else 0.0)
+        if max_amp > 0:
+            region = region / max_amp * 0.9
+        self.preview_audio = region
+        if play and len(region):
+            # Sin sd.wait(): la reproducción arranca y la interfaz sigue libre
+            sd.play(region, self.fs)
+        return region
 
-        def callback(indata, outdata, frames, time, status):
-            if status:
-                print("Status:", status)
-            audio = indata[:, 0]
+    def preview_equalizer(self, eq_settings, start_s=0.0, duration_s=10.0, play=True):
+        return self._preview(
+            lambda segment: apply_equalizer(segment, self.fs, eq_settings, normalize=False),
+            start_s, duration_s, play)
+
+    def preview_noise_reduction(self, level=0.5, start_s=0.0, duration_s=10.0, play=True):
+        if self.audio_data is None:
+            print("No hay audio cargado para previsualizar.")
+            return None
+        # El perfil de ruido sigue saliendo del inicio del archivo, no de la región
+        noise_sample = self.audio_data[:int(0.1 * self.fs)]
+        return self._preview(
+            lambda segment: apply_noise_reduction(segment, self.fs, level, save_path=None,
+                                                  noise_sample=noise_sample, normalize=False),
+            start_s, duration_s, play)
 
-            eq_settings = None
+    def _render_in_background(self, label, params, process, on_done=None):
+        """
+        Aplica process al original en otro hilo. Al terminar llama a
+        on_done(resultado, error). Solo publica el render más reciente: si
+        entretanto se lanzó otro o se cambió/grabó el audio, el resultado se
+        descarta y llega None. render_error y render_discarded describen
+        siempre el último render pedido.
+        """
+        with self._state_lock:
+            self._render_token += 1
+            token = self._render_token
+            audio = self.audio_data
+            generation = self.history.generation
+            parent = self._original_version
+            self.render_error = None
+            self.render_discarded = False
+
+        def run():
+            result, error = None, None
             try:
-                if eq_settings_getter:
-                    eq_settings = eq_settings_getter()
+                version = self.history.apply(process, label, params, parent=parent, make_current=False)
             except Exception as e:
-                print("Error obteniendo EQ settings:", e)
+                print(f"Error al procesar {label}: {e}")
+                version, error = None, e
+            with self._state_lock:
+                latest = token == self._render_token
+                if error is not None:
+                    if latest:
+                        self.render_error = error
+                elif (not latest or version is None or self.audio_data is not audio
+                        or self.history.generation != generation):
+                    print(f"Render de {label} descartado: el audio cambió o hay un render más reciente")
+                    if latest:
+                        self.render_discarded = True
+                else:
+                    self.filtered_audio = result = self.history.checkout(version)
+            if on_done is not None:
+                on_done(result, error)
+
+        thread = threading.Thread(target=run, daemon=True)
+        self._render_threads = [t for t in self._render_threads if t.is_alive()] + [thread]
+        thread.start()
+        return thread
+
+    def render_equalizer(self, eq_settings, on_done=None):
+        return self._render_in_background(
+            "equalizer", eq_settings,
+            lambda audio: apply_equalizer(audio, self.fs, eq_settings), on_done)
 
-            if eq_settings:
-                audio = apply_equalizer(audio, self.fs, eq_settings)
+    def render_noise_reduction(self, level=0.5, on_done=None):
+        return self._render_in_background(
+            "noise_reduction", {"level": level},
+            lambda audio: apply_noise_reduction(audio, self.fs, level), on_done)
 
-            outdata[:, 0] = audio
+    def is_rendering(self):
+        return any(t.is_alive() for t in self._render_threads)
 
-            if record:
-                self._recorded.append(audio.copy())
+    def monitor_audio(self, eq_settings_getter, record=True, comp_settings_getter=None):
+        self._recorded.clear()
+        self._stop_monitor.clear()
+        chain = RealtimeChain(self.fs, MONITOR_BLOCKSIZE)
+        recorder = BlockRecorder(MONITOR_BLOCKSIZE) if record else None
+        self._recorder = recorder
+
+        def poll_settings():
+            # Fuera del hilo de audio: lee los ajustes y solo reconstruye
+            # coeficientes cuando cambian
+            last_eq, last_comp = None, None
+            while not self._stop_monitor.is_set():
+                try:
+                    eq_settings = eq_settings_getter() if eq_settings_getter else None
+                    if eq_settings != last_eq:
+                        chain.set_eq(eq_settings)
+                        last_eq = eq_settings
+                except Exception as e:
+                    print("Error obteniendo EQ settings:", e)
+                try:
+                    comp_settings = comp_settings_getter() if comp_settings_getter else None
+                    if comp_settings != last_comp:
+                        chain.set_compressor(comp_settings)
+                        last_comp = comp_settings
+                except Exception as e:
+                    print("Error obteniendo ajustes del compresor:", e)
+                self._stop_monitor.wait(SETTINGS_POLL_S)
+
+        def collect_recording():
+            while not self._stop_monitor.wait(SETTINGS_POLL_S):
+                self._recorded.extend(recorder.drain())
 
+        def callback(indata, outdata, frames, time, status):
+            if status:
+                print("Status:", status)
+            # Sin reservas de memoria: todo ocurre en los buffers de la cadena
+            chain.process(indata, outdata)
+            if recorder is not None:
+                recorder.push(outdata)
             if self._stop_monitor.is_set():
                 raise sd.CallbackStop()
 
+        self._worker_threads = [threading.Thread(target=poll_settings, daemon=True)]
+        if recorder is not None:
+            self._worker_threads.append(threading.Thread(target=collect_recording, daemon=True))
+        for thread in self._worker_threads:
+            thread.start()
+
         self._stream = sd.Stream(
             samplerate=self.fs,
-            blocksize=4096,
+            blocksize=MONITOR_BLOCKSIZE,
             latency='high',
             dtype='float32',
             channels=1,
@@ -102,6 +305,13 @@ class AudioProcessor:
     def stop_monitoring(self):
         self._stop_monitor.set()
         print("Monitoreo detenido.")
+        for thread in self._worker_threads:
+            thread.join()
+        self._worker_threads = []
+        if self._recorder is not None:
+            self._recorded.extend(self._recorder.drain())
+            if self._recorder.dropped:
+                print(f"Se descartaron {self._recorder.dropped} bloques de la grabación")
         if self._recorded:
             audio_full = np.concatenate(self._recorded)
             sf.write('audio_monitoreado.wav', audio_full, self.fs)
@@ -0,0 +1,193 @@
+import collections
+import functools
+import json
+import threading
+import time
+import tracemalloc
+
+
+_enabled = False
+_track_memory = False
+# Solo paramos tracemalloc si lo arrancó enable(), no si ya lo usaba otro
+_started_tracing = False
+# Solo se guardan los últimos MAX_RECORDS registros sueltos; report() usa
+# los totales por ruta, que se acumulan según llegan
+MAX_RECORDS = 10000
+_records = collections.deque(maxlen=MAX_RECORDS)
+_summary = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(track_memory=False):
+    """
+    Activa la instrumentación. track_memory usa tracemalloc (más lento). Si
+    tracemalloc ya estaba activo por otro, no se toca su pico: cada etapa
+    mide entonces la memoria en sus bordes en lugar del pico interno.
+    """
+    global _enabled, _track_memory, _started_tracing
+    _track_memory = track_memory
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracing = True
+    _enabled = True
+
+
+def disable():
+    global _enabled, _track_memory, _started_tracing
+    _enabled = False
+    if _started_tracing and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _started_tracing = False
+    _track_memory = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _records.clear()
+        _summary.clear()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _fold_peak(stack):
+    # El pico de tracemalloc es global: lo repartimos entre las etapas abiertas
+    # antes de reiniciarlo, así las etapas anidadas no se pisan. Solo lo
+    # reiniciamos si el tracemalloc es nuestro; si no, usamos la memoria actual
+    current, peak = tracemalloc.get_traced_memory()
+    if not _started_tracing:
+        peak = current
+    for open_stage in stack:
+        if peak > open_stage.peak:
+            open_stage.peak = peak
+    if _started_tracing:
+        tracemalloc.reset_peak()
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_samples(self, samples):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("name", "samples", "path", "start", "child_ns", "mem_start", "peak", "memory")
+
+    def __init__(self, name, samples):
+        self.name = name
+        self.samples = samples
+        self.child_ns = 0
+        self.peak = 0
+        self.memory = _track_memory and tracemalloc.is_tracing()
+
+    def add_samples(self, samples):
+        self.samples += samples
+
+    def __enter__(self):
+        stack = _stack()
+        self.path = ";".join([s.name for s in stack] + [self.name])
+        if self.memory:
+            _fold_peak(stack)
+            self.mem_start = tracemalloc.get_traced_memory()[0]
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter_ns() - self.start
+        stack = _stack()
+        if self.memory:
+            _fold_peak(stack)
+        stack.pop()
+        if stack:
+            stack[-1].child_ns += elapsed
+        record = {
+            "stage": self.name,
+            "path": self.path,
+            "ns": elapsed,
+            "self_ns": elapsed - self.child_ns,
+            "samples": int(self.samples),
+            "bytes": max(self.peak - self.mem_start, 0) if self.memory else 0,
+            "thread": threading.get_ident(),
+        }
+        with _lock:
+            _records.append(record)
+            entry = _summary.get(self.path)
+            if entry is None:
+                entry = _summary[self.path] = {
+                    "calls": 0, "total_s": 0.0, "self_s": 0.0, "samples": 0, "bytes": 0,
+                }
+            entry["calls"] += 1
+            entry["total_s"] += record["ns"] / 1e9
+            entry["self_s"] += record["self_ns"] / 1e9
+            entry["samples"] += record["samples"]
+            entry["bytes"] = max(entry["bytes"], record["bytes"])
+        return False
+
+
+def stage(name, samples=0):
+    """
+    Context manager que mide una etapa. Si la instrumentación está apagada
+    devuelve un objeto nulo compartido, sin medir nada.
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, samples)
+
+
+def profiled(name=None):
+    """Decorador que mide la función entera como una etapa."""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(stage_name, 0):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def records():
+    """Los últimos MAX_RECORDS registros sueltos."""
+    with _lock:
+        return list(_records)
+
+
+def report():
+    """Mediciones agregadas por ruta de etapas desde el último reset()."""
+    with _lock:
+        return {path: dict(entry) for path, entry in _summary.items()}
+
+
+def export_json(path):
+    with open(path, "w") as f:
+        json.dump({"stages": report(), "records": records()}, f, indent=2)
+
+
+def export_collapsed(path):
+    """Formato 'pila;de;etapas microsegundos' para flamegraph.pl o speedscope."""
+    with open(path, "w") as f:
+        for stage_path, entry in report().items():
+            f.write(f"{stage_path} {int(entry['self_s'] * 1e6)}\n")
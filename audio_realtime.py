@@ -0,0 +1,257 @@
+"""
+Cadena de procesado para el callback en tiempo real sin reservar memoria.
+
+Todo el trabajo por bloque escribe en buffers creados al inicio (out=,
+operaciones in situ y vistas precalculadas). Los coeficientes se calculan
+fuera del hilo de audio en objetos inmutables y se intercambian asignando
+una referencia, que es atómica en Python.
+"""
+import math
+import numpy as np
+from audio_operations import design_lpf_fir, design_hpf_fir, design_peaking_iir, _one_pole_coeff
+from lazy_imports import lazy_module
+
+signal = lazy_module("scipy.signal")
+
+
+MAX_SUB_BLOCK = 64
+
+
+def sub_block_size(blocksize):
+    return math.gcd(blocksize, MAX_SUB_BLOCK)
+
+
+class _BlockIIR:
+    """
+    Filtro IIR (cascada de secciones b, a) en forma de espacio de estados
+    evaluado por sub-bloques de M muestras:
+        y = T x + O s        s' = A^M s + K x
+    Solo usa productos matriz-vector con out=, sin bucles por muestra.
+    """
+
+    def __init__(self, sections, M):
+        A, B, C, D = None, None, None, None
+        for b, a in sections:
+            a2, b2, c2, d2 = signal.tf2ss(b, a)
+            if A is None:
+                A, B, C, D = a2, b2, c2, d2
+                continue
+            # Cascada: la salida de la etapa anterior alimenta a la nueva
+            n1, n2 = A.shape[0], a2.shape[0]
+            A = np.block([[A, np.zeros((n1, n2))], [b2 @ C, a2]])
+            B = np.vstack([B, b2 @ D])
+            C = np.hstack([d2 @ C, c2])
+            D = d2 @ D
+        B = B[:, 0]
+        C = C[0]
+        D = float(D[0, 0])
+        n = A.shape[0]
+
+        powers = [np.eye(n)]
+        for _ in range(M):
+            powers.append(powers[-1] @ A)
+        h = np.array([D] + [C @ powers[k - 1] @ B for k in range(1, M)])
+
+        self.order = n
+        self.M = M
+        self.toeplitz = np.ascontiguousarray(np.tril(h[np.subtract.outer(np.arange(M), np.arange(M))]))
+        self.observe = np.ascontiguousarray([C @ powers[k] for k in range(M)])
+        self.advance = np.ascontiguousarray(powers[M])
+        self.inject = np.ascontiguousarray(np.column_stack([powers[M - 1 - j] @ B for j in range(M)]))
+
+    def run(self, state, x_views, y_views, tmp_m, tmp_n, tmp_n2):
+        for x, y in zip(x_views, y_views):
+            np.dot(self.toeplitz, x, out=y)
+            np.dot(self.observe, state, out=tmp_m)
+            np.add(y, tmp_m, out=y)
+            np.dot(self.advance, state, out=tmp_n)
+            np.dot(self.inject, x, out=tmp_n2)
+            np.add(tmp_n, tmp_n2, out=state)
+
+
+class EQCoefficients:
+    """Coeficientes del ecualizador listos para el hilo de audio."""
+
+    def __init__(self, fs, eq_settings, blocksize):
+        lpf = design_lpf_fir(fs, cutoff=eq_settings["lpf_cutoff"])
+        hpf = design_hpf_fir(fs, cutoff=eq_settings["hpf_cutoff"])
+        # LPF y HPF en un solo FIR, como matriz de banda para sub-bloques de M:
+        # la fila i recorre las taps muestras que terminan en la salida i
+        fir = np.convolve(lpf, hpf)
+        M = sub_block_size(blocksize)
+        self.taps = len(fir)
+        self.fir_band = np.zeros((M, M + self.taps - 1))
+        for i in range(M):
+            self.fir_band[i, i:i + self.taps] = fir[::-1]
+        sections = [design_peaking_iir(fs, band["f0"], band["gain"], band["Q"])
+                    for band in eq_settings["bands"]]
+        self.iir = _BlockIIR(sections, sub_block_size(blocksize)) if sections else None
+        order = self.iir.order if self.iir is not None else 0
+        self.state = np.zeros(order)
+        self.tmp_n = np.zeros(order)
+        self.tmp_n2 = np.zeros(order)
+
+
+class CompressorCoefficients:
+    def __init__(self, fs, comp_settings, blocksize):
+        M = sub_block_size(blocksize)
+        a_att = _one_pole_coeff(fs, comp_settings.get("attack", 5))
+        a_rel = _one_pole_coeff(fs, comp_settings.get("release", 100))
+        # Numerador [1 - a, 0]: con un solo coeficiente tf2ss lo tomaría como
+        # (1 - a)·z⁻¹ y la envolvente iría una muestra por detrás de apply_compressor
+        self.attack = _BlockIIR([([1 - a_att, 0], [1, -a_att])], M)
+        self.release = _BlockIIR([([1 - a_rel, 0], [1, -a_rel])], M)
+        ratio = comp_settings.get("ratio", 4)
+        self.threshold = float(comp_settings["threshold"])
+        self.slope = 1.0 if np.isinf(ratio) else 1.0 - 1.0 / ratio
+        self.makeup = float(comp_settings.get("makeup", 0))
+        ceiling = comp_settings.get("ceiling")
+        self.ceiling = float(ceiling) if ceiling is not None else None
+        self.att_state = np.zeros(1)
+        self.rel_state = np.zeros(1)
+        self.tmp_n = np.zeros(1)
+        self.tmp_n2 = np.zeros(1)
+
+
+class RealtimeChain:
+    """
+    EQ + compresor/normalización por bloque sobre buffers preasignados.
+    set_eq/set_compressor construyen los coeficientes fuera del callback;
+    process() solo lee la referencia actual.
+    """
+
+    def __init__(self, fs, blocksize, fir_taps=201):
+        if blocksize < fir_taps - 1:
+            raise ValueError(f"blocksize debe ser al menos {fir_taps - 1} muestras")
+        self.fs = fs
+        self.blocksize = N = blocksize
+        self.M = M = sub_block_size(blocksize)
+        self.eq = None
+        self.compressor = None
+
+        # Historial FIR: (taps-1) muestras anteriores seguidas del bloque actual
+        self._taps = fir_taps
+        self._fir_hist = np.zeros(fir_taps - 1 + N)
+        self._fir_windows = [self._fir_hist[i:i + M + fir_taps - 1] for i in range(0, N, M)]
+        self._hist_head = self._fir_hist[:fir_taps - 1]
+        self._hist_tail = self._fir_hist[N:]
+        self._block = self._fir_hist[fir_taps - 1:]
+        self._block_in = self._block.reshape(N, 1)
+
+        self._fir_out = np.zeros(N)
+        self._iir_out = np.zeros(N)
+        self._env_att = np.zeros(N)
+        self._env_rel = np.zeros(N)
+        self._work = np.zeros(N)
+        self._out_2d = self._iir_out.reshape(N, 1)
+
+        self._tmp_m = np.zeros(M)
+
+        def views(buf):
+            return [buf[i:i + M] for i in range(0, N, M)]
+        self._fir_out_views = views(self._fir_out)
+        self._iir_out_views = views(self._iir_out)
+        self._work_views = views(self._work)
+        self._env_att_views = views(self._env_att)
+        self._env_rel_views = views(self._env_rel)
+
+    def set_eq(self, eq_settings):
+        if not eq_settings:
+            self.eq = None
+            return
+        new = EQCoefficients(self.fs, eq_settings, self.blocksize)
+        old = self.eq
+        # Conservamos el estado del IIR para que el cambio no corte el sonido
+        if old is not None and len(old.state) == len(new.state):
+            new.state[:] = old.state
+        self.eq = new
+
+    def set_compressor(self, comp_settings):
+        if not comp_settings:
+            self.compressor = None
+            return
+        new = CompressorCoefficients(self.fs, comp_settings, self.blocksize)
+        old = self.compressor
+        if old is not None:
+            new.att_state[:] = old.att_state
+            new.rel_state[:] = old.rel_state
+        self.compressor = new
+
+    def process(self, indata, outdata):
+        """indata/outdata: arrays (blocksize, 1) del stream."""
+        eq = self.eq
+        comp = self.compressor
+        np.copyto(self._block_in, indata, casting="same_kind")
+
+        if eq is not None and eq.taps == self._taps:
+            for window, y in zip(self._fir_windows, self._fir_out_views):
+                np.dot(eq.fir_band, window, out=y)
+            if eq.iir is not None:
+                eq.iir.run(eq.state, self._fir_out_views, self._iir_out_views,
+                           self._tmp_m, eq.tmp_n, eq.tmp_n2)
+            else:
+                np.copyto(self._iir_out, self._fir_out)
+        else:
+            np.copyto(self._iir_out, self._block)
+        np.copyto(self._hist_head, self._hist_tail)
+
+        y = self._iir_out
+        if comp is not None:
+            np.abs(y, out=self._work)
+            comp.attack.run(comp.att_state, self._work_views, self._env_att_views,
+                            self._tmp_m, comp.tmp_n, comp.tmp_n2)
+            comp.release.run(comp.rel_state, self._work_views, self._env_rel_views,
+                             self._tmp_m, comp.tmp_n, comp.tmp_n2)
+            env = self._work
+            np.maximum(self._env_att, self._env_rel, out=env)
+            np.add(env, 1e-10, out=env)
+            np.log10(env, out=env)
+            np.multiply(env, 20, out=env)
+            np.subtract(env, comp.threshold, out=env)
+            np.maximum(env, 0, out=env)
+            np.multiply(env, -comp.slope / 20, out=env)
+            np.add(env, comp.makeup / 20, out=env)
+            np.power(10.0, env, out=env)
+            np.multiply(y, env, out=y)
+            if comp.ceiling is not None:
+                np.minimum(y, comp.ceiling, out=y)
+                np.maximum(y, -comp.ceiling, out=y)
+        elif eq is not None:
+            # Misma normalización por bloque que apply_equalizer
+            np.abs(y, out=self._work)
+            max_amp = self._work.max()
+            if max_amp > 0:
+                np.multiply(y, 0.9 / max_amp, out=y)
+
+        np.copyto(outdata, self._out_2d, casting="same_kind")
+        return outdata
+
+
+class BlockRecorder:
+    """
+    Anillo de bloques preasignados. El callback copia cada bloque con push()
+    y otro hilo los recoge con drain(); si el lector se retrasa más de
+    capacity bloques, los nuevos se descartan y se cuentan en dropped.
+    """
+
+    def __init__(self, blocksize, capacity=128, dtype=np.float32):
+        self.capacity = capacity
+        self._buffer = np.zeros((capacity, blocksize, 1), dtype=dtype)
+        self._slots = list(self._buffer)
+        self._written = 0
+        self._read = 0
+        self.dropped = 0
+
+    def push(self, block):
+        if self._written - self._read >= self.capacity:
+            self.dropped += 1
+            return
+        np.copyto(self._slots[self._written % self.capacity], block, casting="same_kind")
+        self._written += 1
+
+    def drain(self):
+        blocks = []
+        while self._read < self._written:
+            blocks.append(self._slots[self._read % self.capacity][:, 0].copy())
+            self._read += 1
+        return blocks
@@ -1,36 +1,48 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.fft import fft
+from audio_cache import welch_spectrum
 from audio_operations import design_lpf_fir, design_hpf_fir, design_peaking_iir
-from scipy import signal
+from lazy_imports import lazy_module
 
+plt = lazy_module("matplotlib.pyplot")
+signal = lazy_module("scipy.signal")
 
-def visualize_time(audio, fs, title="Audio en el Tiempo"):
+
+def visualize_time(audio, fs, title="Audio en el Tiempo", analysis=None):
     plt.figure(figsize=(10, 3))
-    time_axis = np.arange(0, len(audio)) / fs
-    plt.plot(time_axis, audio)
+    if analysis is not None:
+        # Envolvente precalculada: no hace falta dibujar todas las muestras
+        plt.fill_between(analysis["env_time"], analysis["env_min"], analysis["env_max"], linewidth=0.5)
+    else:
+        time_axis = np.arange(0, len(audio)) / fs
+        plt.plot(time_axis, audio)
     plt.title(title)
     plt.xlabel("Tiempo (s)")
     plt.ylabel("Amplitud")
     plt.grid(True)
     plt.show()
 
-def visualize_frequency(audio, fs, title="Espectro de Frecuencia"):
-    N = len(audio)
-    X = fft(audio)
-    X_mag = np.abs(X[:N//2]) / N
-    freq = np.linspace(0, fs/2, N//2)
+def visualize_frequency(audio, fs, title="Espectro de Frecuencia", analysis=None):
     plt.figure(figsize=(10, 3))
-    plt.semilogx(freq, 20 * np.log10(X_mag + 1e-10))
+    # Siempre el espectro de Welch: precalculado si hay análisis, si no al momento
+    if analysis is not None:
+        freq, psd = analysis["welch_freq"], analysis["welch_psd"]
+    else:
+        freq, psd = welch_spectrum(audio, fs)
+    plt.semilogx(freq, 10 * np.log10(psd + 1e-20))
     plt.title(title)
     plt.xlabel("Frecuencia (Hz)")
-    plt.ylabel("Magnitud (dB)")
+    plt.ylabel("Densidad espectral (dB/Hz)")
     plt.grid(True)
     plt.show()
 
-def visualize_spectrogram(audio, fs, title="Espectrograma"):
+def visualize_spectrogram(audio, fs, title="Espectrograma", analysis=None):
     plt.figure(figsize=(10, 5))
-    plt.specgram(audio, NFFT=1024, Fs=fs, noverlap=512, cmap='viridis')
+    if analysis is not None and "spec_db" in analysis:
+        # Miniatura precalculada del espectrograma
+        plt.pcolormesh(analysis["spec_time"], analysis["spec_freq"], analysis["spec_db"],
+                       shading='auto', cmap='viridis')
+    else:
+        plt.specgram(audio, NFFT=1024, Fs=fs, noverlap=512, cmap='viridis')
     plt.title(title)
     plt.xlabel("Tiempo (s)")
     plt.ylabel("Frecuencia (Hz)")
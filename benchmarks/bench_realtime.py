@@ -0,0 +1,146 @@
+"""
+Mide el coste por bloque de la cadena del callback de monitoreo
+(audio_realtime.RealtimeChain + BlockRecorder) y comprueba con tracemalloc
+que no reserva buffers de NumPy. Sale con código 1 si hay reservas o si el
+bloque tarda más que su duración en tiempo real.
+
+    python benchmarks/bench_realtime.py [--blocks 500] [--json salida.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from audio_operations import apply_compressor
+from audio_realtime import RealtimeChain, BlockRecorder
+
+
+FS = 44100
+BLOCKSIZE = 4096
+EQ_SETTINGS = {
+    "lpf_cutoff": 4000,
+    "hpf_cutoff": 200,
+    "bands": [
+        {"f0": 100, "gain": 6, "Q": 0.7},
+        {"f0": 1000, "gain": -4, "Q": 2.0},
+        {"f0": 5000, "gain": 3, "Q": 1.0},
+    ],
+}
+COMP_SETTINGS = {"threshold": -20, "ratio": 4, "attack": 5, "release": 100, "ceiling": 0.99}
+# Margen para objetos pequeños de Python (escalares, enteros) que no son arrays
+MAX_PEAK_BYTES = 4096
+# La salida del stream es float32: diferencias por debajo de esto son redondeo
+MAX_COMPRESSOR_ERROR = 1e-5
+
+
+def run_case(name, comp_settings, blocks):
+    chain = RealtimeChain(FS, BLOCKSIZE)
+    chain.set_eq(EQ_SETTINGS)
+    chain.set_compressor(comp_settings)
+    recorder = BlockRecorder(BLOCKSIZE, capacity=blocks + 8)
+    indata = (np.random.default_rng(0).standard_normal((BLOCKSIZE, 1)) * 0.1).astype(np.float32)
+    outdata = np.zeros((BLOCKSIZE, 1), dtype=np.float32)
+
+    def callback():
+        chain.process(indata, outdata)
+        recorder.push(outdata)
+
+    for _ in range(10):
+        callback()
+
+    t0 = time.perf_counter()
+    for _ in range(blocks):
+        callback()
+    per_block = (time.perf_counter() - t0) / blocks
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    for _ in range(blocks):
+        callback()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Las reservas de datos de NumPy van a su propio dominio de tracemalloc
+    numpy_domain = tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)
+    numpy_allocs = sum(stat.count_diff for stat in
+                       after.filter_traces([numpy_domain]).compare_to(
+                           before.filter_traces([numpy_domain]), "filename")
+                       if stat.count_diff > 0)
+
+    return {
+        "case": name,
+        "per_block_ms": per_block * 1000,
+        "realtime_budget_ms": BLOCKSIZE / FS * 1000,
+        "peak_bytes": peak,
+        "numpy_allocations": numpy_allocs,
+    }
+
+
+def check_compressor(blocks=20):
+    """Compara el compresor de la cadena con apply_compressor muestra a muestra."""
+    rng = np.random.default_rng(1)
+    n = blocks * BLOCKSIZE
+    # Silencio y ráfagas fuertes para que el ataque tenga transitorios que seguir
+    level = np.where((np.arange(n) // (BLOCKSIZE // 2)) % 3 == 0, 0.9, 0.01)
+    x = (rng.standard_normal(n) * level).astype(np.float32)
+
+    expected, _ = apply_compressor(x.astype(np.float64), FS, COMP_SETTINGS)
+
+    chain = RealtimeChain(FS, BLOCKSIZE)
+    chain.set_compressor(COMP_SETTINGS)
+    out = np.zeros((BLOCKSIZE, 1), dtype=np.float32)
+    got = np.empty(n)
+    for i in range(blocks):
+        chain.process(x[i * BLOCKSIZE:(i + 1) * BLOCKSIZE].reshape(BLOCKSIZE, 1), out)
+        got[i * BLOCKSIZE:(i + 1) * BLOCKSIZE] = out[:, 0]
+
+    diff = np.abs(got - expected)
+    return {
+        "case": "compresor vs apply_compressor",
+        "max_abs_error": float(diff.max()),
+        "first_mismatch": int(np.argmax(diff > MAX_COMPRESSOR_ERROR)) if diff.max() > MAX_COMPRESSOR_ERROR else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blocks", type=int, default=500)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    results = [
+        run_case("eq", None, args.blocks),
+        run_case("eq+compresor", COMP_SETTINGS, args.blocks),
+    ]
+    failed = False
+    for r in results:
+        ok = (r["numpy_allocations"] == 0 and r["peak_bytes"] <= MAX_PEAK_BYTES
+              and r["per_block_ms"] < r["realtime_budget_ms"])
+        failed |= not ok
+        print(f"{r['case']}: {r['per_block_ms']:.2f} ms/bloque (límite {r['realtime_budget_ms']:.1f} ms), "
+              f"pico {r['peak_bytes']} B, arrays NumPy nuevos {r['numpy_allocations']} "
+              f"{'OK' if ok else 'FALLA'}")
+
+    equivalence = check_compressor()
+    ok = equivalence["max_abs_error"] <= MAX_COMPRESSOR_ERROR
+    failed |= not ok
+    print(f"{equivalence['case']}: error máximo {equivalence['max_abs_error']:.2e} "
+          f"(límite {MAX_COMPRESSOR_ERROR:.0e}) {'OK' if ok else 'FALLA'}")
+    results.append(equivalence)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
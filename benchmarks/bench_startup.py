@@ -0,0 +1,86 @@
+"""
+Mide el arranque de gui.py y main.py: cuánto tarda en importarse cada
+punto de entrada en un intérprete limpio y qué módulos pesados quedan
+cargados. Sale con código 1 si se supera el presupuesto.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--json salida.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Presupuesto de arranque en segundos (mediana de las repeticiones)
+STARTUP_BUDGET_S = {
+    "main": 0.35,
+    "gui": 0.45,
+}
+
+HEAVY_MODULES = [
+    "matplotlib.pyplot",
+    "scipy.signal",
+    "scipy.fft",
+    "sounddevice",
+    "soundfile",
+]
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy_loaded": heavy}}))
+"""
+
+
+def measure(module, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_DIR, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            lines = out.stderr.strip().splitlines()
+            return {"error": lines[-1] if lines else f"código {out.returncode}"}
+        runs.append(json.loads(out.stdout))
+    times = sorted(r["seconds"] for r in runs)
+    return {
+        "median_s": times[len(times) // 2],
+        "min_s": times[0],
+        "budget_s": STARTUP_BUDGET_S[module],
+        "heavy_loaded": runs[-1]["heavy_loaded"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    results = {module: measure(module, args.repeat) for module in STARTUP_BUDGET_S}
+    failed = False
+    for module, r in results.items():
+        if "error" in r:
+            print(f"{module}: no se pudo importar ({r['error']}) FALLA")
+            failed = True
+            continue
+        ok = r["median_s"] <= r["budget_s"] and not r["heavy_loaded"]
+        failed |= not ok
+        print(f"{module}: {r['median_s'] * 1000:.1f} ms (presupuesto {r['budget_s'] * 1000:.0f} ms)"
+              f" pesados cargados: {r['heavy_loaded'] or 'ninguno'} {'OK' if ok else 'FALLA'}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
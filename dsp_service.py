@@ -0,0 +1,435 @@
+"""
+Servicio DSP sin interfaz: un servidor HTTP mínimo sobre asyncio (TCP o
+socket Unix) que recibe un WAV y una especificación de operación, la
+ejecuta con audio_operations en un pool de procesos acotado y devuelve el
+WAV resultante por partes (Transfer-Encoding: chunked).
+
+    POST /process          cuerpo: WAV, cabecera X-DSP-Operation: JSON
+    GET  /metrics          latencias por petición y profundidad de la cola
+
+Ejemplos de operación:
+    {"op": "bandpass", "lowcut": 300, "highcut": 3400}
+    {"op": "noise_reduction", "noise_level": 0.5}
+    {"op": "equalizer", "eq_settings": {...}}
+    [{"op": "bandpass"}, {"op": "compressor", "comp_settings": {...}}]
+
+    python dsp_service.py --port 8765 --workers 4 --max-queue 16
+
+Respuestas de error: 400 audio o especificación no válidos, 408 el cuerpo no
+llegó a tiempo, 503 cola llena o worker caído (con Retry-After), 500 fallo
+interno.
+"""
+import argparse
+import asyncio
+import collections
+import http.client
+import io
+import json
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from lazy_imports import lazy_module
+
+sf = lazy_module("soundfile")
+
+
+MAX_BODY_BYTES = 512 * 1024 * 1024
+CHUNK_BYTES = 64 * 1024
+DISCARD_TIMEOUT_S = 10
+UPLOAD_TIMEOUT_S = 30
+LATENCY_WINDOW = 1000
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class OperationError(Exception):
+    """Audio o parámetros no válidos: la petición es del cliente (400)."""
+
+
+OPERATIONS = {
+    "bandpass": (),
+    "noise_reduction": (),
+    "equalizer": ("eq_settings",),
+    "compressor": ("comp_settings",),
+}
+
+
+def validate_spec(spec):
+    """Comprueba la especificación antes de encolarla; lanza ServiceError(400)."""
+    steps = spec if isinstance(spec, list) else [spec]
+    if not steps:
+        raise ServiceError(400, "La especificación no tiene operaciones")
+    for step in steps:
+        if not isinstance(step, dict):
+            raise ServiceError(400, f"Cada operación debe ser un objeto JSON: {step!r}")
+        op = step.get("op")
+        if op not in OPERATIONS:
+            raise ServiceError(400, f"Operación desconocida: {op!r}")
+        for key in OPERATIONS[op]:
+            if not isinstance(step.get(key), dict):
+                raise ServiceError(400, f"La operación {op!r} necesita el objeto {key!r}")
+
+
+def _run_step(audio, fs, step):
+    op = step.get("op")
+    try:
+        return _apply_step(audio, fs, op, step)
+    except (KeyError, TypeError, ValueError) as e:
+        raise OperationError(f"Parámetros no válidos para {op!r}: {e}") from e
+
+
+def _apply_step(audio, fs, op, step):
+    import audio_operations as ops
+
+    if op == "bandpass":
+        b = ops.design_bandpass_filter(fs, step.get("lowcut", 300), step.get("highcut", 3400),
+                                       step.get("order", 101))
+        return ops.apply_filter(audio, b, save_path=None)
+    if op == "noise_reduction":
+        return ops.apply_noise_reduction(audio, fs, step.get("noise_level", 0.5), save_path=None)
+    if op == "equalizer":
+        return ops.apply_equalizer(audio, fs, step["eq_settings"], step.get("normalize", True))
+    if op == "compressor":
+        return ops.apply_compressor(audio, fs, step["comp_settings"])[0]
+    raise OperationError(f"Operación desconocida: {op!r}")
+
+
+def run_operation(wav_bytes, spec):
+    """Se ejecuta en el pool: decodifica, aplica la operación y codifica."""
+    try:
+        audio, fs = sf.read(io.BytesIO(wav_bytes), always_2d=False)
+    except Exception as e:
+        raise OperationError(f"No se pudo leer el WAV: {e}") from e
+    if len(audio.shape) > 1:
+        audio = np.mean(audio, axis=1)
+    for step in spec if isinstance(spec, list) else [spec]:
+        audio = _run_step(audio, fs, step)
+    out = io.BytesIO()
+    sf.write(out, audio, fs, format="WAV", subtype="FLOAT")
+    return out.getvalue()
+
+
+class DSPService:
+    def __init__(self, workers=None, max_queue=16, max_body_bytes=MAX_BODY_BYTES,
+                 max_uploads=None, upload_timeout=UPLOAD_TIMEOUT_S):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_body_bytes = max_body_bytes
+        # Subidas en curso: aparte de la cola, que solo cuenta cuerpos completos
+        self.max_uploads = max_uploads or self.workers + max_queue
+        self.upload_timeout = upload_timeout
+        self._pool = None
+        self._server = None
+        self._slots = None
+        self._uploading = 0
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._slots = asyncio.Semaphore(self.workers)
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def metrics(self):
+        def percentile(values, q):
+            if not values:
+                return None
+            return values[min(int(q * len(values)), len(values) - 1)]
+
+        totals = sorted(l["total_s"] for l in self._latencies)
+        waits = sorted(l["queue_s"] for l in self._latencies)
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "max_uploads": self.max_uploads,
+            "uploading": self._uploading,
+            "queue_depth": self._waiting,
+            "in_flight": self._running,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+            "failed": self._failed,
+            "latency_s": {q: percentile(totals, v) for q, v in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+            "queue_wait_s": {q: percentile(waits, v) for q, v in (("p50", 0.5), ("p95", 0.95))},
+            "recent": list(self._latencies)[-20:],
+        }
+
+    def _reject(self):
+        self._rejected += 1
+        raise ServiceError(503, "Cola llena, reintenta más tarde")
+
+    async def _process(self, read_body, spec):
+        # Contrapresión: como mucho `workers` en ejecución, `max_queue` con el
+        # cuerpo ya recibido esperando turno y `max_uploads` subiendo. Si la
+        # cola ya está llena rechazamos antes de leer el cuerpo
+        if self._waiting >= self.max_queue or self._uploading >= self.max_uploads:
+            self._reject()
+        self._uploading += 1
+        try:
+            t_upload = time.perf_counter()
+            body = await asyncio.wait_for(read_body(), self.upload_timeout)
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            raise ServiceError(408, "El cuerpo de la petición no llegó a tiempo")
+        finally:
+            self._uploading -= 1
+        if self._waiting >= self.max_queue:
+            self._reject()
+        t0 = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        t_start = time.perf_counter()
+        self._running += 1
+        pool = self._pool
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(pool, run_operation, body, spec)
+        except OperationError as e:
+            raise ServiceError(400, str(e))
+        except BrokenProcessPool:
+            # Un worker murió: el pool ya no sirve. Lo sustituimos una sola vez
+            # aunque fallen a la vez varias peticiones que lo usaban
+            self._failed += 1
+            if self._pool is pool:
+                print("El pool de procesos se rompió; creando uno nuevo")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise ServiceError(503, "Worker caído, reintenta más tarde")
+        except Exception as e:
+            self._failed += 1
+            raise ServiceError(500, f"Error procesando el audio: {e}")
+        finally:
+            self._running -= 1
+            self._slots.release()
+        t_end = time.perf_counter()
+        self._completed += 1
+        self._latencies.append({
+            "upload_s": t0 - t_upload,
+            "queue_s": t_start - t0,
+            "process_s": t_end - t_start,
+            "total_s": t_end - t0,
+            "bytes_in": len(body),
+            "bytes_out": len(result),
+        })
+        return result
+
+    async def _handle(self, reader, writer):
+        unread = 0
+        try:
+            head = await self._read_head(reader)
+            if head is None:
+                return
+            method, path, headers = head
+            if method == "GET" and path == "/metrics":
+                await self._send(writer, 200, json.dumps(self.metrics()).encode(), "application/json")
+            elif method == "POST" and path == "/process":
+                try:
+                    unread = int(headers.get("content-length", 0))
+                except ValueError:
+                    raise ServiceError(400, "Content-Length no válido")
+                if unread < 0:
+                    unread = 0
+                    raise ServiceError(400, "Content-Length no válido")
+                if unread > self.max_body_bytes:
+                    raise ServiceError(413, "Audio demasiado grande")
+                try:
+                    spec = json.loads(headers.get("x-dsp-operation", "null"))
+                except ValueError:
+                    raise ServiceError(400, "X-DSP-Operation no es JSON válido")
+                if not spec:
+                    raise ServiceError(400, "Falta la cabecera X-DSP-Operation")
+                validate_spec(spec)
+
+                async def read_body():
+                    nonlocal unread
+                    body = await reader.readexactly(unread)
+                    unread = 0
+                    return body
+
+                result = await self._process(read_body, spec)
+                await self._send_chunked(writer, result, "audio/wav")
+            else:
+                raise ServiceError(404, "Ruta no encontrada")
+        except ServiceError as e:
+            # Tras un 408 no esperamos más al cuerpo que no llegó
+            await self._send_error(writer, reader, e.status, str(e), 0 if e.status == 408 else unread)
+        except ValueError:
+            await self._send_error(writer, reader, 400, "Petición mal formada", unread)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _send_error(self, writer, reader, status, message, unread):
+        try:
+            await self._send(writer, status, json.dumps({"error": message}).encode(), "application/json")
+            # Descartamos el cuerpo pendiente por trozos, sin guardarlo: si se
+            # cerrara con datos sin leer, el cliente recibiría un RST en vez
+            # de la respuesta
+            while unread > 0:
+                chunk = await asyncio.wait_for(reader.read(min(unread, CHUNK_BYTES)), DISCARD_TIMEOUT_S)
+                if not chunk:
+                    break
+                unread -= len(chunk)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+    @staticmethod
+    async def _read_head(reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        if not request_line:
+            return None
+        method, path, version = request_line.split(" ")
+        if not version.startswith("HTTP/"):
+            raise ValueError(f"Línea de petición no válida: {request_line!r}")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise ValueError(f"Cabecera no válida: {line!r}")
+            headers[name.strip().lower()] = value.strip()
+        return method, path, headers
+
+    @staticmethod
+    async def _send(writer, status, body, content_type):
+        reason = http.client.responses.get(status, "")
+        extra = "Retry-After: 1\r\n" if status == 503 else ""
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n{extra}Connection: close\r\n\r\n".encode())
+        writer.write(body)
+        await writer.drain()
+
+    @staticmethod
+    async def _send_chunked(writer, body, content_type):
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n"
+                     "Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n".encode())
+        view = memoryview(body)
+        for start in range(0, len(view), CHUNK_BYTES):
+            chunk = view[start:start + CHUNK_BYTES]
+            writer.write(b"%x\r\n" % len(chunk))
+            writer.write(chunk)
+            writer.write(b"\r\n")
+            # Respeta el ritmo del cliente antes de mandar el siguiente trozo
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self._unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._unix_path)
+
+
+def _connect(host, port, unix_path, timeout):
+    if unix_path:
+        return _UnixHTTPConnection(unix_path, timeout=timeout)
+    return http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+def process_remote(audio, fs, spec, host="127.0.0.1", port=8765, unix_path=None, timeout=None):
+    """Cliente: envía el audio al servicio y devuelve (audio_procesado, fs)."""
+    buf = io.BytesIO()
+    sf.write(buf, audio, fs, format="WAV", subtype="FLOAT")
+    conn = _connect(host, port, unix_path, timeout)
+    try:
+        try:
+            conn.request("POST", "/process", body=buf.getvalue(),
+                         headers={"Content-Type": "audio/wav", "X-DSP-Operation": json.dumps(spec)})
+        except (BrokenPipeError, ConnectionResetError):
+            # El servidor puede rechazar (503, 400) sin leer el cuerpo;
+            # la respuesta ya está en el socket
+            pass
+        response = conn.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            raise ServiceError(response.status, json.loads(payload).get("error", ""))
+    finally:
+        conn.close()
+    return sf.read(io.BytesIO(payload), always_2d=False)
+
+
+def fetch_metrics(host="127.0.0.1", port=8765, unix_path=None, timeout=None):
+    conn = _connect(host, port, unix_path, timeout)
+    try:
+        conn.request("GET", "/metrics")
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+async def _serve(args):
+    service = DSPService(workers=args.workers, max_queue=args.max_queue,
+                         max_uploads=args.max_uploads, upload_timeout=args.upload_timeout)
+    await service.start(args.host, args.port, args.unix)
+    print(f"Servicio DSP escuchando en {args.unix or service.address}")
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio DSP sin interfaz")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Ruta de socket Unix en lugar de TCP")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--max-uploads", type=int, default=None)
+    parser.add_argument("--upload-timeout", type=float, default=UPLOAD_TIMEOUT_S)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        print("Servicio detenido.")
+
+
+if __name__ == "__main__":
+    main()
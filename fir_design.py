@@ -0,0 +1,125 @@
+"""
+Diseño vectorizado de bancos de filtros FIR pasa-banda por ventana (sinc
+truncada, como en prueba_matlab.py) y cálculo de sus respuestas en lote.
+
+Las frecuencias van normalizadas como en MATLAB: w/pi, de 0 a 1 (1 = fs/2).
+
+    bank = design_bandpass_bank([(0.2, 0.5), (0.24, 0.6)], orders=[32, 66, 128],
+                                windows=["hanning", "hamming", "blackman"])
+    w, mag = bank_response(bank)
+    metrics = bank_metrics(bank, w, mag)
+    best = select_design(bank, metrics, min_stopband_db=50)
+"""
+import itertools
+import numpy as np
+
+
+# Ventanas de coseno generalizadas: a0 - a1 cos(2πk/(L-1)) + a2 cos(4πk/(L-1)),
+# iguales a np.hanning, np.hamming y np.blackman
+WINDOWS = {
+    "rectangular": (1.0, 0.0, 0.0),
+    "hanning": (0.5, 0.5, 0.0),
+    "hamming": (0.54, 0.46, 0.0),
+    "blackman": (0.42, 0.5, 0.08),
+}
+
+
+def hz_to_normalized(freq_hz, fs):
+    return np.asarray(freq_hz, dtype=float) / (fs / 2)
+
+
+def design_bandpass_bank(cutoffs, orders, windows=("hanning",)):
+    """
+    Diseña en una sola pasada todas las combinaciones de pares de corte
+    (w1, w2), órdenes M y ventanas. Cada filtro es la resta de dos pasa-bajas
+    sinc, centrado en n = -M/2..M/2, multiplicado por la ventana.
+
+    Devuelve un dict con "coeffs" (D, M_max+1) rellenado con ceros a la
+    derecha, "lengths" (D,) y los parámetros de cada diseño.
+    """
+    cutoffs = np.atleast_2d(np.asarray(cutoffs, dtype=float))
+    orders = np.asarray(orders, dtype=int).ravel()
+    windows = list(windows)
+    unknown = [w for w in windows if w not in WINDOWS]
+    if unknown:
+        raise ValueError(f"Ventanas desconocidas: {unknown}")
+    if np.any(orders < 1):
+        raise ValueError("El orden debe ser al menos 1")
+
+    lengths = orders + 1
+    l_max = lengths.max()
+    k = np.arange(l_max)
+    valid = k[None, :] < lengths[:, None]                       # (O, L)
+    n = np.where(valid, k[None, :] - orders[:, None] / 2, 0.0)  # (O, L)
+
+    # Pasa-banda ideal: (w2/π) sinc(w2 n) - (w1/π) sinc(w1 n), con w en unidades de π
+    w1 = cutoffs[:, 0, None, None]
+    w2 = cutoffs[:, 1, None, None]
+    ideal = w2 * np.sinc(w2 * n[None]) - w1 * np.sinc(w1 * n[None])   # (K, O, L)
+
+    coef = np.array([WINDOWS[w] for w in windows])                     # (W, 3)
+    phase = 2 * np.pi * k[None, :] / (lengths[:, None] - 1).clip(min=1)  # (O, L)
+    win = (coef[:, 0, None, None]
+           - coef[:, 1, None, None] * np.cos(phase)[None]
+           + coef[:, 2, None, None] * np.cos(2 * phase)[None])          # (W, O, L)
+    win = np.where(valid[None], win, 0.0)
+
+    coeffs = ideal[:, :, None, :] * win.transpose(1, 0, 2)[None]       # (K, O, W, L)
+
+    combos = list(itertools.product(range(len(cutoffs)), range(len(orders)), range(len(windows))))
+    ci, oi, wi = (np.array(idx) for idx in zip(*combos))
+    return {
+        "coeffs": coeffs.reshape(-1, l_max),
+        "lengths": lengths[oi],
+        "lowcut": cutoffs[ci, 0],
+        "highcut": cutoffs[ci, 1],
+        "order": orders[oi],
+        "window": np.array(windows)[wi],
+    }
+
+
+def bank_response(bank, nfft=8192):
+    """Magnitud de todas las respuestas con un único rfft por lotes."""
+    mag = np.abs(np.fft.rfft(bank["coeffs"], n=nfft, axis=-1))
+    w = np.linspace(0, 1, mag.shape[-1])
+    return w, mag
+
+
+def bank_metrics(bank, w, mag, transition=0.05):
+    """
+    Rizado en la banda de paso y atenuación mínima en la de rechazo (dB),
+    dejando `transition` (en w/π) a cada lado de los cortes.
+    """
+    low = bank["lowcut"][:, None]
+    high = bank["highcut"][:, None]
+    passband = (w[None] >= low + transition) & (w[None] <= high - transition)
+    stopband = (w[None] <= low - transition) | (w[None] >= high + transition)
+
+    mag_db = 20 * np.log10(mag + 1e-12)
+    pass_max = np.where(passband, mag_db, -np.inf).max(axis=1)
+    pass_min = np.where(passband, mag_db, np.inf).min(axis=1)
+    stop_max = np.where(stopband, mag_db, -np.inf).max(axis=1)
+    return {
+        "passband_ripple_db": np.where(passband.any(axis=1), pass_max - pass_min, np.nan),
+        "stopband_atten_db": np.where(stopband.any(axis=1), pass_max - stop_max, np.nan),
+        "passband_gain_db": np.where(passband.any(axis=1), pass_max, np.nan),
+    }
+
+
+def select_design(bank, metrics, min_stopband_db=40, max_ripple_db=1.0):
+    """
+    Índice del diseño de menor orden que cumple las especificaciones (a
+    igualdad de orden, el de más atenuación), o None si ninguno las cumple.
+    """
+    ok = ((metrics["stopband_atten_db"] >= min_stopband_db)
+          & (metrics["passband_ripple_db"] <= max_ripple_db))
+    candidates = np.flatnonzero(ok)
+    if len(candidates) == 0:
+        return None
+    order = np.lexsort((-metrics["stopband_atten_db"][candidates], bank["order"][candidates]))
+    return int(candidates[order[0]])
+
+
+def get_filter(bank, index):
+    """Coeficientes del diseño `index` sin el relleno de ceros."""
+    return bank["coeffs"][index, :bank["lengths"][index]]
@@ -1,14 +1,15 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
-import sounddevice as sd
-from audio_operations import apply_equalizer
-#from audio_operations import apply_compressor
 from audio_visuals import visualize_eq_response
 
 
 
 from audio_processor import AudioProcessor
+from audio_cache import AnalysisCache
+from lazy_imports import lazy_module, preload
+
+sd = lazy_module("sounddevice")
 from audio_visuals import (
     visualize_time,
     visualize_frequency,
@@ -19,9 +20,13 @@ class AudioApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Procesador de Audio - Reducción de Ruido")
-        self.processor = AudioProcessor()
+        self.processor = AudioProcessor(analysis_cache=AnalysisCache())
         self.eq_settings_cache = None
+        self.comp_settings_cache = None
+        self._render_request = 0
         self.root.after(200, self.update_eq_settings)
+        # Dispositivos de audio, scipy y matplotlib se cargan cuando ya se ve la ventana
+        self.root.after_idle(self.preload_modules)
 
                 # ========== INTERFAZ DE BOTONES ==========
 
@@ -93,6 +98,30 @@ class AudioApp:
         self.stop_monitor_btn = tk.Button(root, text="Detener Monitoreo", width=25, command=self.stop_monitoring)
         self.stop_monitor_btn.grid(row=13, column=0, columnspan=2, pady=10)
 
+        # Compresor / limitador para el monitoreo
+        self.comp_enabled = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Compresor - umbral (dB) / ratio", variable=self.comp_enabled).grid(row=14, column=0)
+        self.comp_threshold_slider = tk.Scale(root, from_=-40, to=0, resolution=1, orient=tk.HORIZONTAL)
+        self.comp_threshold_slider.set(-18)
+        self.comp_threshold_slider.grid(row=14, column=1)
+        self.comp_ratio_slider = tk.Scale(root, from_=1, to=20, resolution=0.5, orient=tk.HORIZONTAL)
+        self.comp_ratio_slider.set(4)
+        self.comp_ratio_slider.grid(row=14, column=2)
+
+        # Previsualización: solo procesa la región elegida
+        tk.Label(root, text="Previsualizar desde (s) / duración (s)").grid(row=15, column=0)
+        self.preview_start_slider = tk.Scale(root, from_=0, to=60, resolution=0.5, orient=tk.HORIZONTAL)
+        self.preview_start_slider.grid(row=15, column=1)
+        self.preview_duration_slider = tk.Scale(root, from_=1, to=30, resolution=1, orient=tk.HORIZONTAL)
+        self.preview_duration_slider.set(10)
+        self.preview_duration_slider.grid(row=15, column=2)
+
+        self.preview_eq_btn = tk.Button(root, text="Previsualizar EQ", width=20, command=self.preview_eq)
+        self.preview_eq_btn.grid(row=16, column=0, padx=10, pady=10)
+
+        self.preview_noise_btn = tk.Button(root, text="Previsualizar Ruido", width=20, command=self.preview_noise)
+        self.preview_noise_btn.grid(row=16, column=1, padx=10, pady=10)
+
     # ========== FUNCIONES PRINCIPALES ==========
 
     def load_audio(self):
@@ -105,6 +134,9 @@ class AudioApp:
 
         success = self.processor.load_audio(path)
         if success is not None:
+            duration = len(self.processor.audio_data) / self.processor.fs
+            self.preview_start_slider.configure(to=max(duration, 0.5))
+            self.preview_start_slider.set(0)
             messagebox.showinfo("Carga completada", f"Audio cargado:\n{os.path.basename(path)}")
             self.root.title(f"Procesador de Audio - {os.path.basename(path)}")
         else:
@@ -125,27 +157,75 @@ class AudioApp:
             messagebox.showwarning("Aviso", "Primero aplica reducción de ruido.")
 
     def reduce_noise(self):
-        result = self.processor.reduce_noise(level=0.5)
-        if result is not None:
-            messagebox.showinfo("Éxito", "Reducción de ruido aplicada.")
-        else:
+        if self.processor.audio_data is None:
             messagebox.showwarning("Aviso", "No se pudo aplicar reducción de ruido.")
+            return
+        self.processor.render_noise_reduction(level=0.5)
+        self._wait_render("Reducción de ruido aplicada.")
+
+    def _wait_render(self, done_message, request=None):
+        # Solo informa el último render pedido; las esperas anteriores se callan
+        if request is None:
+            self._render_request += 1
+            request = self._render_request
+        if request != self._render_request:
+            return
+        # El render completo corre en otro hilo; aquí solo consultamos si acabó
+        if self.processor.is_rendering():
+            self.root.after(100, self._wait_render, done_message, request)
+            return
+        if self.processor.render_error is not None:
+            messagebox.showerror("Error", f"No se pudo procesar el audio: {self.processor.render_error}")
+        elif self.processor.render_discarded:
+            messagebox.showwarning("Aviso", "El audio cambió durante el proceso; el resultado se descartó.")
+        elif self.processor.filtered_audio is not None:
+            messagebox.showinfo("Éxito", done_message)
+
+    def _preview_range(self):
+        return self.preview_start_slider.get(), self.preview_duration_slider.get()
+
+    def preview_eq(self):
+        if self.processor.audio_data is None:
+            messagebox.showwarning("Aviso", "Primero debes cargar un audio.")
+            return
+        start_s, duration_s = self._preview_range()
+        self.processor.preview_equalizer(self._current_eq_settings(), start_s, duration_s)
+
+    def preview_noise(self):
+        if self.processor.audio_data is None:
+            messagebox.showwarning("Aviso", "Primero debes cargar un audio.")
+            return
+        start_s, duration_s = self._preview_range()
+        self.processor.preview_noise_reduction(0.5, start_s, duration_s)
+
+    def _current_eq_settings(self):
+        return {
+            "lpf_cutoff": self.lpf_slider.get(),
+            "hpf_cutoff": self.hpf_slider.get(),
+            "bands": [
+                {
+                    "f0": f0.get(),
+                    "gain": gain.get(),
+                    "Q": q.get()
+                } for f0, gain, q in self.bands
+            ]
+        }
 
     def visualize_time(self):
         if self.processor.audio_data is not None:
-            visualize_time(self.processor.audio_data, self.processor.fs)
+            visualize_time(self.processor.audio_data, self.processor.fs, analysis=self.processor.analysis)
         else:
             messagebox.showwarning("Aviso", "Primero debes cargar un audio.")
 
     def visualize_frequency(self):
         if self.processor.audio_data is not None:
-            visualize_frequency(self.processor.audio_data, self.processor.fs)
+            visualize_frequency(self.processor.audio_data, self.processor.fs, analysis=self.processor.analysis)
         else:
             messagebox.showwarning("Aviso", "Primero debes cargar un audio.")
 
     def visualize_spectrogram(self):
         if self.processor.audio_data is not None:
-            visualize_spectrogram(self.processor.audio_data, self.processor.fs)
+            visualize_spectrogram(self.processor.audio_data, self.processor.fs, analysis=self.processor.analysis)
         else:
             messagebox.showwarning("Aviso", "Primero debes cargar un audio.")
   
@@ -154,21 +234,8 @@ class AudioApp:
             messagebox.showwarning("Aviso", "Primero debes cargar un audio.")
             return
 
-        eq_settings = {
-            "lpf_cutoff": self.lpf_slider.get(),
-            "hpf_cutoff": self.hpf_slider.get(),
-            "bands": []
-        }
-
-        for f0, gain, q in self.bands:
-            eq_settings["bands"].append({
-                "f0": f0.get(),
-                "gain": gain.get(),
-                "Q": q.get()
-            })
-
-        self.processor.filtered_audio = apply_equalizer(self.processor.audio_data, self.processor.fs, eq_settings)
-        messagebox.showinfo("Éxito", "Ecualizador aplicado correctamente.")
+        self.processor.render_equalizer(self._current_eq_settings())
+        self._wait_render("Ecualizador aplicado correctamente.")
 
     def show_eq_curve(self):
         if self.processor.audio_data is None:
@@ -193,7 +260,10 @@ class AudioApp:
     def monitor_mic(self):
         def get_eq_settings():
             return self.eq_settings_cache
-        self.processor.monitor_audio(get_eq_settings)
+
+        def get_comp_settings():
+            return self.comp_settings_cache
+        self.processor.monitor_audio(get_eq_settings, comp_settings_getter=get_comp_settings)
         messagebox.showinfo("Monitoreo", "Escuchando el micrófono en tiempo real.")
 
 
@@ -202,6 +272,15 @@ class AudioApp:
         messagebox.showinfo("Monitoreo detenido", "Se ha detenido el monitoreo y el audio fue guardado.")
 
 
+    def preload_modules(self):
+        preload(
+            "scipy.signal",
+            "scipy.fft",
+            "soundfile",
+            lambda: sd.query_devices(),
+            "matplotlib.pyplot",
+        )
+
     def update_eq_settings(self):
         try:
             self.eq_settings_cache = {
@@ -215,8 +294,19 @@ class AudioApp:
                     } for f0, gain, q in self.bands
                 ]
             }
+            if self.comp_enabled.get():
+                self.comp_settings_cache = {
+                    "threshold": self.comp_threshold_slider.get(),
+                    "ratio": self.comp_ratio_slider.get(),
+                    "attack": 5,
+                    "release": 100,
+                    "ceiling": 0.99
+                }
+            else:
+                self.comp_settings_cache = None
         except tk.TclError:
             self.eq_settings_cache = None
+            self.comp_settings_cache = None
         self.root.after(200, self.update_eq_settings)
 
 
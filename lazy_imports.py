@@ -0,0 +1,57 @@
+import importlib
+import threading
+
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """
+    Sustituto de un módulo que solo lo importa al acceder al primer atributo.
+    Sirve para no pagar matplotlib, scipy o sounddevice al arrancar.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with _lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "cargado" if self._module is not None else "pendiente"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_module(name):
+    return LazyModule(name)
+
+
+def preload(*modules, on_done=None):
+    """Importa los módulos en un hilo en segundo plano."""
+    def run():
+        for module in modules:
+            try:
+                if isinstance(module, LazyModule):
+                    module._load()
+                elif callable(module):
+                    module()
+                else:
+                    importlib.import_module(module)
+            except Exception as e:
+                print(f"Error precargando {module}: {e}")
+        if on_done is not None:
+            on_done()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -1,9 +1,12 @@
 from audio_processor import AudioProcessor
+from audio_cache import AnalysisCache
 import audio_operations as ops
 import audio_visuals as vis
+from lazy_imports import preload
 
 def main():
-    processor = AudioProcessor()
+    processor = AudioProcessor(analysis_cache=AnalysisCache())
+    preload("sounddevice", "soundfile", "scipy.signal", "matplotlib.pyplot")
 
     while True:
         print("\nOpciones:")
@@ -27,11 +30,11 @@ def main():
         elif choice == "3":
             processor.play_audio()
         elif choice == "4":
-            vis.visualize_time(processor.audio_data, processor.fs)
+            vis.visualize_time(processor.audio_data, processor.fs, analysis=processor.analysis)
         elif choice == "5":
-            vis.visualize_frequency(processor.audio_data, processor.fs)
+            vis.visualize_frequency(processor.audio_data, processor.fs, analysis=processor.analysis)
         elif choice == "6":
-            vis.visualize_spectrogram(processor.audio_data, processor.fs)
+            vis.visualize_spectrogram(processor.audio_data, processor.fs, analysis=processor.analysis)
         elif choice == "7":
             b = ops.design_bandpass_filter(processor.fs)
             processor.filtered_audio = ops.apply_filter(processor.audio_data, b)
@@ -1,60 +1,58 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy import signal
-import sounddevice as sd
-import soundfile as sf
+from fir_design import design_bandpass_bank, bank_response, get_filter
+from lazy_imports import lazy_module
 
-def matlab_style_filter_design(fs=44100):
+plt = lazy_module("matplotlib.pyplot")
+signal = lazy_module("scipy.signal")
+sd = lazy_module("sounddevice")
+sf = lazy_module("soundfile")
+
+def matlab_style_filter_design(fs=44100, plot=True):
     """
     Implementa un filtro pasa-banda al estilo MATLAB usando el método de 
-    muestreo en frecuencia con la función sinc
+    muestreo en frecuencia con la función sinc.
+    El diseño y la respuesta salen de fir_design; con plot=False no dibuja
+    nada y se puede usar desde otros scripts.
     """
     # Parámetros del filtro
     M = 66  # Orden del filtro (como en tu ejemplo MATLAB)
     n = np.arange(-M/2, M/2+1)  # Vector de muestras
     
-    # Frecuencias de corte normalizadas (comparable a tu ejemplo MATLAB)
-    wc1 = 0.24 * np.pi  # Frecuencia de corte superior (paso bajo 1)
-    wc2 = 0.6 * np.pi   # Frecuencia de corte inferior (paso bajo 2)
-    
-    # h(n) del filtro pasa-bajas con wc1
-    hn1 = (wc1/np.pi) * np.sinc(wc1*n/np.pi)
+    # Frecuencias de corte normalizadas (comparable a tu ejemplo MATLAB):
+    # wc1 = 0.24*pi (paso bajo 1) y wc2 = 0.6*pi (paso bajo 2); h(n) es la
+    # resta de los dos pasa-bajas multiplicada por la ventana de Hanning
+    bank = design_bandpass_bank([(0.24, 0.6)], [M], ["hanning"])
+    hn_windowed = get_filter(bank, 0)
     
-    # h(n) del filtro pasa-bajas con wc2
-    hn2 = (wc2/np.pi) * np.sinc(wc2*n/np.pi)
+    if not plot:
+        return hn_windowed
     
-    # h(n) del filtro pasa-banda (resta de los dos filtros pasa-bajas)
-    hn = hn2 - hn1
+    # Respuesta en Frecuencia H(w), de 0 a pi (es simétrica)
+    w, H = bank_response(bank, nfft=10000)
+    H1jw = H[0]
     
-    # Aplicamos ventana de Hanning
-    win = np.hanning(len(n))
-    hn_windowed = hn * win
+    plt.figure(figsize=(10, 12))
     
     # Visualizar la respuesta al impulso
-    plt.figure(figsize=(10, 6))
+    plt.subplot(3, 1, 1)
     plt.stem(n, hn_windowed)
     plt.title('Respuesta al impulso truncada x ventana')
     plt.xlabel('n [muestra]')
     plt.grid(True)
-    plt.show()
-    
-    # Respuesta en Frecuencia H(w)
-    N1 = 10000
-    H1jw = np.fft.fftshift(np.abs(np.fft.fft(hn_windowed, N1)))
-    w = np.arange(-N1/2, N1/2) * (2*np.pi/N1)
     
-    plt.figure(figsize=(10, 6))
-    plt.plot(w/np.pi, H1jw)  # Escala Lineal
+    plt.subplot(3, 1, 2)
+    plt.plot(w, H1jw)  # Escala Lineal
     plt.grid(True)
     plt.title('Respuesta en frecuencia')
     plt.xlabel('w/pi [rad/s]')
-    plt.show()
     
-    plt.figure(figsize=(10, 6))
-    plt.plot(w/np.pi, 20*np.log10(H1jw + 1e-10))  # Escala en dB, añadimos 1e-10 para evitar log(0)
+    plt.subplot(3, 1, 3)
+    plt.plot(w, 20*np.log10(H1jw + 1e-10))  # Escala en dB, añadimos 1e-10 para evitar log(0)
     plt.grid(True)
     plt.title('Respuesta en frecuencia en dB')
     plt.xlabel('w/pi [rad/s]')
+    
+    plt.tight_layout()
     plt.show()
     
     return hn_windowed
@@ -0,0 +1,150 @@
+"""
+Pruebas del servicio DSP en localhost: servidor en el puerto 0 dentro de un
+hilo y peticiones con process_remote/fetch_metrics o con un socket crudo.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import dsp_service
+from dsp_service import DSPService, ServiceError, fetch_metrics, process_remote
+
+
+FS = 44100
+EQ_SPEC = {
+    "op": "equalizer",
+    "eq_settings": {
+        "lpf_cutoff": 4000,
+        "hpf_cutoff": 200,
+        "bands": [{"f0": 1000, "gain": 3, "Q": 1.0}],
+    },
+}
+
+
+class ServiceTestCase(unittest.TestCase):
+    workers = 1
+    max_queue = 1
+    upload_timeout = dsp_service.UPLOAD_TIMEOUT_S
+
+    def setUp(self):
+        self.service = DSPService(workers=self.workers, max_queue=self.max_queue,
+                                  upload_timeout=self.upload_timeout)
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        async def serve():
+            await self.service.start("127.0.0.1", 0)
+            ready.set()
+            try:
+                await self.service.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(serve(),), daemon=True)
+        self.thread.start()
+        ready.wait(10)
+        self.port = self.service.address[1]
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.service.close(), self.loop).result(30)
+        self.thread.join(10)
+        self.loop.close()
+
+    def request(self, audio, spec):
+        """Devuelve el código HTTP de la respuesta (200 si fue bien)."""
+        try:
+            process_remote(audio, FS, spec, port=self.port, timeout=30)
+            return 200
+        except ServiceError as e:
+            return e.status
+
+    def raw_request(self, data, stall=False):
+        sock = socket.create_connection(("127.0.0.1", self.port), timeout=30)
+        sock.sendall(data)
+        if stall:
+            return sock
+        try:
+            return sock.recv(4096).split(b"\r\n")[0]
+        finally:
+            sock.close()
+
+
+class TestRequests(ServiceTestCase):
+    def test_success(self):
+        audio = np.random.default_rng(0).standard_normal(FS).astype(np.float32) * 0.1
+        out, fs = process_remote(audio, FS, EQ_SPEC, port=self.port, timeout=30)
+        self.assertEqual(fs, FS)
+        self.assertEqual(len(out), len(audio))
+        self.assertEqual(fetch_metrics(port=self.port)["completed"], 1)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.request(np.zeros(100), {"op": "nope"}), 400)
+        self.assertEqual(self.request(np.zeros(100), {"op": "equalizer"}), 400)
+        self.assertEqual(self.raw_request(b"GARBAGE\r\n\r\n"), b"HTTP/1.1 400 Bad Request")
+        self.assertEqual(self.raw_request(b"POST /process HTTP/1.1\r\nContent-Length: abc\r\n\r\n"),
+                         b"HTTP/1.1 400 Bad Request")
+        body = b"esto no es un WAV"
+        head = (b'POST /process HTTP/1.1\r\nContent-Length: %d\r\nX-DSP-Operation: {"op": "bandpass"}\r\n\r\n'
+                % len(body))
+        self.assertEqual(self.raw_request(head + body), b"HTTP/1.1 400 Bad Request")
+        metrics = fetch_metrics(port=self.port)
+        self.assertEqual(metrics["failed"], 0)
+        self.assertEqual(metrics["in_flight"], 0)
+
+    def test_queue_full(self):
+        audio = np.random.default_rng(1).standard_normal(FS * 10) * 0.1
+        with ThreadPoolExecutor(8) as pool:
+            statuses = list(pool.map(lambda _: self.request(audio, EQ_SPEC), range(8)))
+        self.assertIn(200, statuses)
+        self.assertIn(503, statuses)
+        self.assertEqual(set(statuses), {200, 503})
+        metrics = fetch_metrics(port=self.port)
+        self.assertEqual(metrics["rejected"], statuses.count(503))
+        self.assertEqual(metrics["completed"], statuses.count(200))
+
+    def test_recovers_from_broken_pool(self):
+        audio = np.zeros(FS // 10)
+        self.assertEqual(self.request(audio, EQ_SPEC), 200)
+        for process in list(self.service._pool._processes.values()):
+            process.kill()
+        self.assertEqual(self.request(audio, EQ_SPEC), 503)
+        self.assertEqual(self.request(audio, EQ_SPEC), 200)
+
+
+class TestStalledUploads(ServiceTestCase):
+    workers = 2
+    max_queue = 2
+    upload_timeout = 1.0
+
+    def test_stalled_uploads_do_not_fill_the_queue(self):
+        head = (b'POST /process HTTP/1.1\r\nContent-Length: 1000\r\n'
+                b'X-DSP-Operation: {"op": "bandpass"}\r\n\r\nabc')
+        stalled = [self.raw_request(head, stall=True) for _ in range(2)]
+        try:
+            time.sleep(0.2)
+            self.assertEqual(fetch_metrics(port=self.port)["uploading"], 2)
+            audio = np.zeros(FS // 10)
+            self.assertEqual(self.request(audio, EQ_SPEC), 200)
+            for sock in stalled:
+                self.assertEqual(sock.recv(4096).split(b"\r\n")[0], b"HTTP/1.1 408 Request Timeout")
+        finally:
+            for sock in stalled:
+                sock.close()
+        metrics = fetch_metrics(port=self.port)
+        self.assertEqual(metrics["timed_out"], 2)
+        self.assertEqual(metrics["uploading"], 0)
+        self.assertEqual(metrics["queue_depth"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()